@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from unittest import TestCase
+
+from motorengine.asyncio import Document, StringField, connect
+from motorengine.asyncio import connection
+from motorengine.asyncio.database import Database
+
+
+class CollUser(Document):
+    email = StringField()
+
+
+class TestColl(TestCase):
+    def setUp(self):
+        # the driver only connects on the first operation, so no server is needed
+        connect("test", host="localhost", port=27017)
+
+    def tearDown(self):
+        connection.cleanup()
+
+    def test_coll(self):
+        iterations = 100000
+        client = connection._connections[connection.DEFAULT_CONNECTION_NAME]
+
+        start = time.time()
+
+        for index in range(iterations):
+            # what get_connection and coll did before handles were cached
+            database = Database(client, getattr(client, "test"))
+            database.database[CollUser.__collection__]
+
+        uncached_time = time.time() - start
+
+        start = time.time()
+
+        for index in range(iterations):
+            CollUser.objects.coll()
+
+        cached_time = time.time() - start
+
+        print()
+        print()
+        print("[Uncached] %d collections resolved in %.2fs (%.2f ops/s)" % (
+            iterations, uncached_time, (float(iterations) / uncached_time)))
+        print("[Cached] %d collections resolved in %.2fs (%.2f ops/s)" % (
+            iterations, cached_time, (float(iterations) / cached_time)))
+        print()
+        print()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import tracemalloc
+from unittest import TestCase
+
+from motorengine.asyncio import Document, StringField, IntField, BooleanField
+
+
+class RegularDocument(Document):
+    name = StringField()
+    email = StringField()
+    age = IntField()
+    is_active = BooleanField()
+
+
+class CompactDocument(Document):
+    __compact__ = True
+
+    name = StringField()
+    email = StringField()
+    age = IntField()
+    is_active = BooleanField()
+
+
+class TestCompact(TestCase):
+    def get_son(self, index):
+        return {
+            '_id': index,
+            'name': 'name%d' % index,
+            'email': 'user%d@gmail.com' % index,
+            'age': index,
+            'is_active': True,
+        }
+
+    def measure(self, document_class, count):
+        sons = [self.get_son(index) for index in range(count)]
+
+        tracemalloc.start()
+        documents = [document_class.from_son(son) for son in sons]
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # the values are shared by both layouts, so only the documents are measured
+        del sons
+        del documents
+
+        return size
+
+    def test_compact_instance_size(self):
+        count = 100000
+
+        regular_size = self.measure(RegularDocument, count)
+        compact_size = self.measure(CompactDocument, count)
+
+        print()
+        print()
+        print("[Regular] %d documents use %.2fMB (%.2f bytes per document)" % (
+            count, regular_size / 1024.0 / 1024.0, float(regular_size) / count))
+        print("[Compact] %d documents use %.2fMB (%.2f bytes per document)" % (
+            count, compact_size / 1024.0 / 1024.0, float(compact_size) / count))
+        print()
+        print()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from unittest import TestCase
+
+from motorengine.asyncio import Document, StringField
+
+
+FIELD_COUNT = 50
+
+FromSonDocument = type('FromSonDocument', (Document, ), dict(
+    ('field%d' % index, StringField(db_field='db_field%d' % index))
+    for index in range(FIELD_COUNT)
+))
+
+
+def linear_get_field_by_db_name(cls, name):
+    for field_name, field in cls._fields.items():
+        if name == field.db_field or name.lstrip("_") == field.db_field:
+            return field
+    return None
+
+
+class TestFromSon(TestCase):
+    def get_son(self):
+        return dict(
+            ('db_field%d' % index, 'value%d' % index)
+            for index in range(FIELD_COUNT)
+        )
+
+    def test_from_son(self):
+        iterations = 10000
+        sons = [self.get_son() for i in range(iterations)]
+
+        start = time.time()
+
+        for son in sons:
+            for name in son:
+                linear_get_field_by_db_name(FromSonDocument, name)
+
+        linear_time = time.time() - start
+
+        start = time.time()
+
+        for son in sons:
+            for name in son:
+                FromSonDocument.get_field_by_db_name(name)
+
+        lookup_time = time.time() - start
+
+        start = time.time()
+
+        for son in sons:
+            FromSonDocument.from_son(son)
+
+        from_son_time = time.time() - start
+
+        print()
+        print()
+        print("[Linear scan] %d documents with %d fields resolved in %.2fs (%.2f docs/s)" % (
+            iterations, FIELD_COUNT, linear_time, (float(iterations) / linear_time)))
+        print("[Lookup table] %d documents with %d fields resolved in %.2fs (%.2f docs/s)" % (
+            iterations, FIELD_COUNT, lookup_time, (float(iterations) / lookup_time)))
+        print("[MotorEngine] %d documents with %d fields hydrated in %.2fs (%.2f docs/s)" % (
+            iterations, FIELD_COUNT, from_son_time, (float(iterations) / from_son_time)))
+        print()
+        print()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from unittest import TestCase
+
+from motorengine.asyncio import Document, StringField, BooleanField
+from motorengine.query_builder.node import Param
+
+
+class PreparedUser(Document):
+    email = StringField()
+    active = BooleanField()
+
+
+class TestPreparedQuery(TestCase):
+    def test_prepared_query(self):
+        iterations = 50000
+        emails = ['user%d@gmail.com' % index for index in range(iterations)]
+
+        start = time.time()
+
+        for email in emails:
+            queryset = PreparedUser.objects.filter(email=email, active=True)
+            queryset.get_query_from_filters(queryset._filters)
+
+        filter_time = time.time() - start
+
+        find_user = PreparedUser.objects.prepare(email=Param('email'), active=True)
+
+        start = time.time()
+
+        for email in emails:
+            find_user.bind(email=email)._get_query()
+
+        prepared_time = time.time() - start
+
+        print()
+        print()
+        print("[Filter] %d queries built in %.2fs (%.2f ops/s)" % (
+            iterations, filter_time, (float(iterations) / filter_time)))
+        print("[Prepared] %d queries built in %.2fs (%.2f ops/s)" % (
+            iterations, prepared_time, (float(iterations) / prepared_time)))
+        print()
+        print()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+from unittest import TestCase
+
+from bson import BSON
+from bson.objectid import ObjectId
+from bson.codec_options import CodecOptions
+
+from motorengine.asyncio import Document, StringField
+from motorengine.base.raw import RawElements
+
+
+FIELD_COUNT = 40
+
+RawBsonDocument = type('RawBsonDocument', (Document, ), dict(
+    ('field%d' % index, StringField())
+    for index in range(FIELD_COUNT)
+))
+
+
+class TestRawBson(TestCase):
+    def get_bson(self):
+        son = {'_id': ObjectId()}
+        son.update(
+            ('field%d' % index, 'value%d' % index)
+            for index in range(FIELD_COUNT)
+        )
+        return BSON.encode(son)
+
+    def test_raw_bson(self):
+        iterations = 10000
+        codec_options = CodecOptions()
+        documents = [self.get_bson() for i in range(iterations)]
+
+        start = time.time()
+
+        for data in documents:
+            document = RawBsonDocument.from_son(BSON(data).decode(codec_options))
+            document.field0
+            document.field1
+
+        decoded_time = time.time() - start
+
+        start = time.time()
+
+        for data in documents:
+            document = RawBsonDocument.from_son(RawElements(data, codec_options))
+            document.field0
+            document.field1
+
+        raw_time = time.time() - start
+
+        print()
+        print()
+        print("[Decoded] %d documents with %d fields read 2 fields in %.2fs (%.2f docs/s)" % (
+            iterations, FIELD_COUNT, decoded_time, (float(iterations) / decoded_time)))
+        print("[Raw BSON] %d documents with %d fields read 2 fields in %.2fs (%.2f docs/s)" % (
+            iterations, FIELD_COUNT, raw_time, (float(iterations) / raw_time)))
+        print()
+        print()
@@ -4,7 +4,7 @@
 __version__ = '1.1.3'
 
 try:
-    from pymongo import ASCENDING, DESCENDING  # NOQA
+    from pymongo import ASCENDING, DESCENDING, ReadPreference  # NOQA
 
     from motorengine.fields import (  # NOQA
         BaseField, StringField, BooleanField, DateTimeField,
@@ -13,7 +13,8 @@ try:
         JsonField, ObjectIdField, DictField
     )
 
-    from motorengine.query_builder.node import Q, QNot  # NOQA
+    from motorengine.query_builder.node import Q, QNot, Param  # NOQA
+    from motorengine.base.router import BaseRouter, HashRouter  # NOQA
 
 except ImportError as e:  # NOQA
     # likely setup.py trying to import version
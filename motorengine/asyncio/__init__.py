@@ -1,9 +1,13 @@
 try:
-    from pymongo import ASCENDING, DESCENDING  # NOQA
+    from pymongo import ASCENDING, DESCENDING, ReadPreference  # NOQA
 
     from motorengine.asyncio.connection import connect
     from motorengine.asyncio.connection import disconnect
     from motorengine.asyncio.connection import get_connection
+    from motorengine.asyncio.connection import connect_async
+    from motorengine.asyncio.connection import ensure_connected
+    from motorengine.asyncio.connection import get_pool_stats
+    from motorengine.asyncio.connection import warm_up
     from motorengine.asyncio.document import Document  # NOQA
 
     from motorengine.fields import (  # NOQA
@@ -13,8 +17,9 @@ try:
         JsonField, ObjectIdField, DictField
     )
 
+    from motorengine.base.router import BaseRouter, HashRouter  # NOQA
     from motorengine.asyncio.aggregation.base import Aggregation  # NOQA
-    from motorengine.query_builder.node import Q, QNot  # NOQA
+    from motorengine.query_builder.node import Q, QNot, Param  # NOQA
 
 except ImportError:  # NOQA
     pass  # likely setup.py trying to import version
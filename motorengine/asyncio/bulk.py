@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+from pymongo.errors import BulkWriteError
+
+from motorengine.base.bulk import BaseBulk
+
+
+class Bulk(BaseBulk):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.execute()
+
+    async def execute(self):
+        queryset = self.queryset
+
+        for alias, indexes, operations in self._start():
+            if not queryset.is_index_ensured(alias=alias):
+                await queryset.ensure_index(alias=alias)
+
+            try:
+                res = await queryset.coll(alias).bulk_write(self._get_requests(operations), ordered=self.ordered)
+                api_result = res.bulk_api_result
+            except BulkWriteError as e:
+                api_result = e.details
+
+            if not self._add_result(indexes, operations, api_result):
+                break
+
+        return self.result
@@ -1,8 +1,14 @@
+import asyncio
+
+from bson.objectid import ObjectId
+
 from motorengine.base.document import BaseDocument
 from motorengine.asyncio.metaclasses import DocumentMetaClass
 
 
 class Document(BaseDocument, metaclass=DocumentMetaClass):
+    __slots__ = ()
+
     @classmethod
     async def ensure_index(cls):
         return await cls.objects.ensure_index()
@@ -23,17 +29,44 @@ class Document(BaseDocument, metaclass=DocumentMetaClass):
                 'loaded_values': []
             }
 
-        for (
-            dereference_function, document_id, values_collection,
-            field_name, fill_values_method
-        ) in references:
-            doc = await dereference_function(document_id)
-            if fill_values_method is None:
-                fill_values_method = self.fill_values_collection
-
-            fill_values_method(values_collection, field_name, doc)
+        await self.resolve_references(references, alias=alias)
 
         return {
             'loaded_reference_count': reference_count,
-            'loaded_values': values_collection  # FIXME: wtf?
+            'loaded_values': references[-1][2]  # FIXME: wtf?
         }
+
+    @staticmethod
+    async def resolve_references(references, alias=None):
+        '''
+        Loads every reference returned by `find_references` issuing a single
+        `$in` query per referenced document class (and projection) and fills
+        the loaded documents back into their values collections, in order.
+        '''
+        groups = {}
+        reference_groups = []
+        for load_queryset, document_id, values_collection, field_name, fill_values_method in references:
+            key = (
+                load_queryset.__klass__,
+                repr(sorted(load_queryset._loaded_fields.as_dict().items()))
+            )
+            if key not in groups:
+                groups[key] = (load_queryset, [])
+            groups[key][1].append(document_id)
+            reference_groups.append(key)
+
+        keys = list(groups.keys())
+        loaded = await asyncio.gather(*[
+            groups[key][0].in_bulk(groups[key][1], alias=alias)
+            for key in keys
+        ])
+        loaded = dict(zip(keys, loaded))
+
+        for key, reference in zip(reference_groups, references):
+            load_queryset, document_id, values_collection, field_name, fill_values_method = reference
+            doc = loaded[key].get(ObjectId(document_id))
+
+            if fill_values_method is None:
+                fill_values_method = BaseDocument.fill_values_collection
+
+            fill_values_method(values_collection, field_name, doc)
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+
 from easydict import EasyDict
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
 from pymongo.errors import DuplicateKeyError
 
 
-from motorengine.errors import UniqueKeyViolationError
+from motorengine.errors import BulkInsertError, UniqueKeyViolationError
 from motorengine.errors import PartlyLoadedDocumentError
 from motorengine.base.queryset import BaseQuerySet
 
@@ -30,21 +33,30 @@ class QuerySet(BaseQuerySet):
                 msg.format(document.__class__.__name__)
             )
 
+        alias = self._route_document(document, alias)
         self.update_field_on_save_values(document, document._id is not None)
         if self.validate_document(document):
-            await self.ensure_index(alias=alias)
+            if not self.is_index_ensured(alias=alias):
+                await self.ensure_index(alias=alias)
             return await self.save_document(document, alias=alias)
 
     async def save_document(self, document, alias=None):
         doc = document.to_son()
 
         if document._id is not None:
+            update = document.get_changes(doc)
+            if update is None:
+                update = doc
+            elif not update:
+                return document
+
             try:
-                await self.coll(alias).update({'_id': document._id}, doc)
+                await self.coll(alias).update({'_id': document._id}, update)
             except DuplicateKeyError as e:
                 raise UniqueKeyViolationError.from_pymongo(
                     str(e), self.__klass__
                 )
+            document._clear_changes()
         else:
             try:
                 doc_id = await self.coll(alias).insert(doc)
@@ -55,50 +67,126 @@ class QuerySet(BaseQuerySet):
             document._id = doc_id
         return document
 
-    async def bulk_insert(self, documents, alias=None):
-        is_valid = True
-        docs_to_insert = []
+    async def _get_async_insert_chunks(self, documents, chunk_size=None):
+        if not hasattr(documents, '__aiter__'):
+            for chunk in self._get_insert_chunks(documents, chunk_size):
+                yield chunk
+            return
 
-        for document_index, document in enumerate(documents):
-            self.update_field_on_save_values(
-                document, document._id is not None
-            )
-            try:
-                is_valid = is_valid and self.validate_document(document)
-            except Exception as e:
-                raise ValueError(
-                    'Validation for document {} in the documents '
-                    'you are saving failed with: {}'.format(
-                        document_index,
-                        e
-                    )
-                )
+        if chunk_size is None:
+            chunk_size = self.DEFAULT_INSERT_CHUNK_SIZE
 
-            if not is_valid:
-                return
+        offset = 0
+        chunk = []
+        async for document in documents:
+            chunk.append(document)
 
-            docs_to_insert.append(document.to_son())
+            if len(chunk) == chunk_size:
+                yield next(self._get_insert_chunks(chunk, chunk_size, offset))
+                offset += len(chunk)
+                chunk = []
 
-        if not is_valid:
-            return
+        if chunk:
+            yield next(self._get_insert_chunks(chunk, chunk_size, offset))
 
-        doc_ids = await self.coll(alias).insert(docs_to_insert)
+    @staticmethod
+    async def _insert_chunk(coll, documents, sons):
+        doc_ids = await coll.insert(sons)
 
-        for object_index, object_id in enumerate(doc_ids):
-            documents[object_index]._id = object_id
+        for document, object_id in zip(documents, doc_ids):
+            document._id = object_id
         return documents
 
-    async def update(self, definition, alias=None):
-
-        definition = self.transform_definition(definition)
-
-        update_filters = {}
-        if self._filters:
-            update_filters = self.get_query_from_filters(self._filters)
+    async def iter_bulk_insert(self, documents, chunk_size=None, max_in_flight=None, alias=None):
+        '''
+        Inserts the documents of any iterable or async iterable, validating, serializing and
+        sending them `chunk_size` documents at a time, with up to `max_in_flight` chunks being
+        inserted at once. Yields the documents of each chunk, with their `_id` set, as soon as it
+        is inserted::
+
+            async for users in User.objects.iter_bulk_insert(read_users()):
+                ...
+
+        Raises `BulkInsertError` for an invalid document, once the chunks before it are inserted.
+        '''
+        if max_in_flight is None:
+            max_in_flight = self.DEFAULT_INSERTS_IN_FLIGHT
+
+        pending = set()
+        inserted = 0
+        chunks = self._get_async_insert_chunks(documents, chunk_size).__aiter__()
+
+        try:
+            while True:
+                try:
+                    chunk, sons = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                except ValueError as error:
+                    # the chunks in flight are inserted first, so the error tells how many were
+                    if pending:
+                        done, pending = await asyncio.wait(pending)
+                        for future in done:
+                            inserted += len(future.result())
+                            yield future.result()
+                    raise BulkInsertError(str(error), inserted)
+
+                for chunk_alias, chunk_documents, chunk_sons in self._route_chunk(chunk, sons, alias):
+                    if len(pending) >= max_in_flight:
+                        done, pending = await asyncio.wait(
+                            pending, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        for future in done:
+                            inserted += len(future.result())
+                            yield future.result()
+
+                    pending.add(asyncio.ensure_future(
+                        self._insert_chunk(self.coll(chunk_alias), chunk_documents, chunk_sons)
+                    ))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    inserted += len(future.result())
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def bulk_insert(self, documents, alias=None, chunk_size=None, max_in_flight=None):
+        '''
+        Inserts the documents of any iterable or async iterable in chunks (see
+        `iter_bulk_insert`). Returns the documents when given a list or tuple of them and the
+        number of inserted documents otherwise, so the documents don't have to be kept around.
+        An invalid document raises `BulkInsertError`, with the number of documents inserted
+        before it.
+        '''
+        inserted = 0
+        async for chunk in self.iter_bulk_insert(
+                documents, chunk_size=chunk_size, max_in_flight=max_in_flight, alias=alias):
+            inserted += len(chunk)
+
+        if isinstance(documents, (list, tuple)):
+            return documents
+        return inserted
+
+    def bulk(self, ordered=True, chunk_size=None, alias=None):
+        from motorengine.asyncio.bulk import Bulk
+        return Bulk(self, ordered=ordered, chunk_size=chunk_size, alias=alias)
+
+    async def update(self, definition=None, alias=None, **kwargs):
+        '''
+        Updates the documents matched by this queryset. Besides fields, the definition (or the
+        keyword arguments) can use update operators: `update(inc__views=1, push__tags='new')`.
+        '''
+        definition = self.transform_definition(dict(definition or {}, **kwargs))
+
+        update_filters = self._get_query()
+        alias = self._route_query(update_filters, alias)
 
         update_arguments = dict(
             spec=update_filters,
-            document={'$set': definition},
+            document=definition,
             multi=True,
         )
         res = await self.coll(alias).update(**update_arguments)
@@ -114,49 +202,121 @@ class QuerySet(BaseQuerySet):
     async def remove(self, instance=None, alias=None):
         if instance is not None:
             if hasattr(instance, '_id') and instance._id:
+                alias = self._route_document(instance, alias)
                 return await self.coll(alias).remove(instance._id)['n']
         else:
-            if self._filters:
-                remove_filters = self.get_query_from_filters(self._filters)
+            remove_filters = self._get_query()
+            alias = self._route_query(remove_filters, alias)
+            if remove_filters:
                 return await self.coll(alias).remove(remove_filters)['n']
             else:
                 return await self.coll(alias).remove()['n']
 
     async def get(self, _id=None, alias=None, **kwargs):
-        from motorengine.query_builder.node import Q
+        filters = self._get_document_query(_id, **kwargs)
+
+        aliases = self._get_aliases(filters, alias)
+        if len(aliases) > 1:
+            # documents that can't be routed are looked for in all the aliases
+            return self._merge_found(await asyncio.gather(*[
+                self.get(_id, alias=document_alias, **kwargs) for document_alias in aliases
+            ]))
+        alias = aliases[0]
+
+        instance = await self._get_read_coll(alias).find_one(
+            filters, projection=self._loaded_fields.to_query(self.__klass__),
+            **self._get_cursor_options()
+        )
+        return await self._load_document(instance, alias=alias)
 
-        if _id is None and not kwargs:
-            raise RuntimeError('Either an id or a filter must be provided to get')
+    async def _load_document(self, instance, alias=None):
+        if instance is None:
+            return
 
-        if _id is not None:
-            if not isinstance(_id, ObjectId):
-                _id = ObjectId(_id)
+        doc = self._get_document(instance, self._get_codec_options(alias))
+        if not self.is_lazy:
+            await doc.load_references()
+        return doc
+
+    async def modify(self, update=None, new=True, upsert=False, alias=None, **kwargs):
+        '''
+        Atomically updates the first document matched by this queryset (in its order) with the
+        given update (see `update`) and returns it, as it is after the update if `new` is True
+        or before it otherwise. Returns None if no document matched and `upsert` is False::
+
+            job = await Job.objects.filter(status="new").modify(set__status="running")
+        '''
+        alias = self._route_query(self._get_query(), alias)
+        instance = await self._get_read_coll(alias).find_one_and_update(
+            self._get_query(), self.transform_definition(dict(update or {}, **kwargs)),
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER if new else ReturnDocument.BEFORE,
+            **self._get_find_one_and_arguments()
+        )
+        return await self._load_document(instance, alias=alias)
+
+    async def pop_one(self, alias=None):
+        '''
+        Atomically removes the first document matched by this queryset (in its order) and
+        returns it, or None if no document matched.
+        '''
+        alias = self._route_query(self._get_query(), alias)
+        instance = await self._get_read_coll(alias).find_one_and_delete(
+            self._get_query(), **self._get_find_one_and_arguments()
+        )
+        return await self._load_document(instance, alias=alias)
 
-            filters = {
-                '_id': _id
-            }
-        else:
-            filters = Q(**kwargs)
-            filters = self.get_query_from_filters(filters)
+    async def in_bulk(self, ids, alias=None):
+        '''
+        Loads all the documents with the given ids using a single `$in` query
+        and returns them in a dict keyed by `_id`. Missing ids are left out.
+        '''
+        ids = list(set(
+            _id if isinstance(_id, ObjectId) else ObjectId(_id)
+            for _id in ids
+        ))
 
-        instance = await self.coll(alias).find_one(
-            filters, projection=self._loaded_fields.to_query(self.__klass__)
-        )
-        if instance is None:
-            return
-        else:
-            doc = self._resolve_class(instance).from_son(
-                instance,
-                _is_partly_loaded=bool(self._loaded_fields),
-                _reference_loaded_fields=self._reference_loaded_fields
-            )
-            if self.is_lazy:
-                return doc
-            else:
-                await doc.load_references()
-                return doc
+        if not ids:
+            return {}
+
+        query = {'_id': {'$in': ids}}
+        projection = self._loaded_fields.to_query(self.__klass__)
+
+        # ids don't tell the alias of routed documents, so they are looked for in all the aliases
+        aliases = self._get_aliases(query, alias)
+        results = await asyncio.gather(*[
+            self._get_read_coll(document_alias).find(query, projection=projection).to_list(length=None)
+            for document_alias in aliases
+        ])
+
+        result = {}
+        references = []
+        for document_alias, docs in zip(aliases, results):
+            codec_options = self._get_codec_options(document_alias)
+
+            for doc in docs:
+                obj = self._get_document(doc, codec_options)
+
+                if not self.is_lazy:
+                    obj.find_references(document=obj, results=references)
+
+                result[obj._id] = obj
+
+        if references:
+            await self.__klass__.resolve_references(references, alias=alias)
+
+        return result
 
     async def find_all(self, lazy=None, alias=None):
+        aliases = self._get_aliases(self._get_query(), alias)
+        if len(aliases) > 1:
+            # each alias loads the documents up to the limit, which are then merged in order
+            queryset = self._get_alias_queryset()
+            return self._merge_documents(await asyncio.gather(*[
+                queryset.find_all(lazy=lazy, alias=document_alias) for document_alias in aliases
+            ]))
+        alias = aliases[0]
+
         to_list_arguments = {}
         if self._limit is not None:
             to_list_arguments['length'] = self._limit
@@ -165,31 +325,147 @@ class QuerySet(BaseQuerySet):
 
         cursor = self._get_find_cursor(alias=alias)
 
-        self._filters = {}
-
         docs = await cursor.to_list(**to_list_arguments)
 
-        is_partly_loaded = bool(self._loaded_fields)
+        return await self._load_documents(docs, lazy=lazy, alias=alias)
+
+    def __aiter__(self):
+        return self.iterate()
+
+    async def iterate(self, batch_size=None, lazy=None, alias=None):
+        '''
+        Asynchronously iterates over the documents matched by this queryset,
+        fetching and hydrating them `batch_size` documents at a time, so only
+        one batch is held in memory at once::
+
+            async for user in User.objects.filter(active=True):
+                ...
+
+        Like `find_all`, queries the router can't tell the alias of iterate over all the aliases
+        of the router, merging their documents in the order of this queryset.
+        '''
+        if batch_size is None:
+            batch_size = self._batch_size or self.DEFAULT_BATCH_SIZE
+
+        aliases = self._get_aliases(self._get_query(), alias)
+        if len(aliases) > 1:
+            async for document in self._iterate_aliases(aliases, batch_size, lazy):
+                yield document
+            return
+        alias = aliases[0]
+
+        cursor = self._get_find_cursor(alias=alias).batch_size(batch_size)
+
+        while True:
+            docs = await cursor.to_list(length=batch_size)
+            if not docs:
+                break
+
+            for doc in await self._load_documents(docs, lazy=lazy, alias=alias):
+                yield doc
+
+    async def _iterate_aliases(self, aliases, batch_size, lazy):
+        # each alias is iterated in order up to the limit, so only a batch per alias is held
+        # in memory, and the skip is applied after merging their documents
+        skip = self._skip or 0
+        queryset = self._clone(
+            _limit=skip + self._limit if self._limit else None, _skip=None,
+            _loaded_fields=self._get_loaded_fields_with_sort(self._order_fields)
+        )
+        iterators = [
+            queryset.iterate(batch_size=batch_size, lazy=lazy, alias=document_alias)
+            for document_alias in aliases
+        ]
+
+        async def get_next(iterator):
+            try:
+                return await iterator.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        merge_key = self._get_merge_key() if self._order_fields else None
+        documents = list(await asyncio.gather(*[get_next(iterator) for iterator in iterators]))
+        keys = [None] * len(documents)
+        if merge_key is not None:
+            keys = [
+                merge_key(document) if document is not None else None for document in documents
+            ]
+
+        merged = 0
+        try:
+            while True:
+                indexes = [index for index, document in enumerate(documents) if document is not None]
+                if not indexes:
+                    break
+
+                index = indexes[0]
+                if merge_key is not None:
+                    index = min(indexes, key=lambda index: keys[index])
+
+                document = documents[index]
+                documents[index] = await get_next(iterators[index])
+                if merge_key is not None and documents[index] is not None:
+                    keys[index] = merge_key(documents[index])
+
+                merged += 1
+                if merged > skip:
+                    yield document
+
+                if self._limit and merged >= skip + self._limit:
+                    break
+        finally:
+            for iterator in iterators:
+                await iterator.aclose()
+
+    async def _load_documents(self, docs, lazy=None, alias=None):
+        codec_options = self._get_codec_options(alias)
 
         result = []
+        references = []
         for doc in docs:
-            obj = self._resolve_class(doc).from_son(
-                doc,
-                _reference_loaded_fields=self._reference_loaded_fields,
-                _is_partly_loaded=is_partly_loaded
-            )
+            obj = self._get_document(doc, codec_options)
 
             if (lazy is not None and not lazy) or not obj.is_lazy:
-                await obj.load_references(obj._fields)
+                obj.find_references(document=obj, fields=obj._fields, results=references)
 
             result.append(obj)
 
+        # all the references in the batch are resolved together, with one
+        # query per referenced document class
+        if references:
+            await self.__klass__.resolve_references(references)
+
         return result
 
+    async def paginate_after(self, after=None, page_size=None, lazy=None, alias=None):
+        '''
+        Loads the page of documents that comes after `after` in the order of this queryset
+        (with `_id` breaking ties), using range conditions on the order by fields instead
+        of `skip`, so every page costs the same to load::
+
+            page = await User.objects.order_by(User.name).paginate_after(page_size=50)
+            next_page = await User.objects.order_by(User.name).paginate_after(page.next_token)
+
+        `after` is either the `next_token` of the previous page, the last document of that page
+        or the list of its order by values, and is `None` for the first page. The page has the
+        loaded `documents` and the `next_token` of the following page, `None` for the last page.
+        '''
+        if page_size is None:
+            page_size = self.DEFAULT_PAGE_SIZE
+
+        queryset = self._get_page_queryset(after, page_size)
+        documents = await queryset.find_all(lazy=lazy, alias=alias)
+        return self._get_page(documents, page_size)
+
     async def count(self, alias=None, with_filters=False):
-        cursor = self._get_find_cursor(alias=alias)
-        if not with_filters:
-            self._filters = {}
+        # with_filters is kept for compatibility, querysets aren't reset after counting anymore
+        aliases = self._get_aliases(self._get_query(), alias)
+        if len(aliases) > 1:
+            return sum(await asyncio.gather(*[
+                self.count(alias=document_alias) for document_alias in aliases
+            ]))
+
+        cursor = self._get_find_cursor(alias=aliases[0])
         return await cursor.count()
 
     @property
@@ -213,4 +489,6 @@ class QuerySet(BaseQuerySet):
             )
             created_indexes.append(res)
 
+        self._register_index(alias=alias)
+
         return len(created_indexes)
@@ -1 +1,5 @@
-classes_registry = {}
\ No newline at end of file
+classes_registry = {}
+
+# (alias, document class) pairs whose indexes were already ensured in this process. Classes
+# sharing a collection can declare different indexes, so each one ensures its own
+indexes_registry = set()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from abc import ABCMeta
+from abc import abstractmethod
+from collections import OrderedDict
+
+from six import with_metaclass
+from easydict import EasyDict
+from bson.objectid import ObjectId
+from pymongo import InsertOne, ReplaceOne, DeleteOne
+
+from motorengine.errors import PartlyLoadedDocumentError
+
+
+class BaseBulk(with_metaclass(ABCMeta)):
+    '''
+    Accumulates insert, update, upsert and delete operations over documents of the queryset's
+    class and sends them to the database with `bulk_write`, `chunk_size` operations at a time.
+
+    When `ordered` is False the database keeps applying the operations after one of them fails,
+    and so does the bulk with the chunks after the failed one. Failed operations are reported in
+    the `errors` of the result instead of raising.
+
+    Operations over documents of classes with a `__router__` are sent to the alias of their
+    documents, in their order within each alias, one alias after the other.
+    '''
+
+    DEFAULT_CHUNK_SIZE = 1000
+
+    def __init__(self, queryset, ordered=True, chunk_size=None, alias=None):
+        if chunk_size is None:
+            chunk_size = self.DEFAULT_CHUNK_SIZE
+
+        if chunk_size < 1:
+            raise ValueError('The chunk size of a bulk must be a positive number.')
+
+        self.queryset = queryset
+        self.ordered = ordered
+        self.chunk_size = chunk_size
+        self.alias = alias
+        self.result = None
+        self._operations = []
+
+    def __len__(self):
+        return len(self._operations)
+
+    def _get_son(self, document, updating):
+        if document.is_partly_loaded:
+            msg = (
+                'Partly loaded document {0} can\'t be saved. Document should '
+                'be loaded without \'only\', \'exclude\' or \'fields\' '
+                'QuerySet\'s modifiers'
+            )
+            raise PartlyLoadedDocumentError(
+                msg.format(document.__class__.__name__)
+            )
+
+        self.queryset.update_field_on_save_values(document, updating)
+        try:
+            is_valid = self.queryset.validate_document(document)
+        except Exception as e:
+            raise ValueError(
+                'Validation for operation {} in the bulk failed with: {}'.format(
+                    len(self._operations),
+                    e
+                )
+            )
+
+        if not is_valid:
+            raise ValueError(
+                'Validation for operation {} in the bulk failed.'.format(len(self._operations))
+            )
+
+        return document.to_son()
+
+    @staticmethod
+    def _get_id(document, operation):
+        if document._id is None:
+            raise ValueError("Can't {} a document that was not saved yet.".format(operation))
+        return document._id
+
+    def _add(self, operation, document, son, request):
+        alias = self.queryset._route_document(document, self.alias)
+        self._operations.append((operation, document, son, request, alias))
+        return self
+
+    def insert(self, document):
+        son = self._get_son(document, updating=False)
+        # ids are assigned here so they can be set in the documents once the chunk is written
+        son['_id'] = document._id if document._id is not None else ObjectId()
+        return self._add('insert', document, son, InsertOne(son))
+
+    def update(self, document):
+        _id = self._get_id(document, 'update')
+        son = self._get_son(document, updating=True)
+        return self._add('update', document, son, ReplaceOne({'_id': _id}, son))
+
+    def upsert(self, document):
+        son = self._get_son(document, updating=document._id is not None)
+        son['_id'] = document._id if document._id is not None else ObjectId()
+        return self._add('upsert', document, son, ReplaceOne({'_id': son['_id']}, son, upsert=True))
+
+    def save(self, document):
+        if document._id is None:
+            return self.insert(document)
+        return self.update(document)
+
+    def delete(self, document):
+        _id = self._get_id(document, 'delete')
+        return self._add('delete', document, None, DeleteOne({'_id': _id}))
+
+    def _start(self):
+        operations, self._operations = self._operations, []
+
+        self.result = EasyDict({
+            'inserted_count': 0,
+            'matched_count': 0,
+            'modified_count': 0,
+            'deleted_count': 0,
+            'upserted_count': 0,
+            'inserted_ids': [],
+            'upserted_ids': [],
+            'errors': [],
+            'write_concern_errors': [],
+        })
+
+        indexes_by_alias = OrderedDict()
+        for index, operation in enumerate(operations):
+            indexes_by_alias.setdefault(operation[4], []).append(index)
+
+        # chunks have the alias they are written to and the index of each operation in the bulk
+        chunks = []
+        for alias, indexes in indexes_by_alias.items():
+            for offset in range(0, len(indexes), self.chunk_size):
+                chunk_indexes = indexes[offset:offset + self.chunk_size]
+                chunks.append((alias, chunk_indexes, [operations[index] for index in chunk_indexes]))
+
+        return iter(chunks)
+
+    @staticmethod
+    def _get_requests(operations):
+        return [operation[3] for operation in operations]
+
+    def _add_result(self, indexes, operations, api_result):
+        '''
+        Adds the outcome of a chunk to the result of the bulk and sets the ids of the inserted
+        and upserted documents. Returns whether the next chunks should be written.
+        '''
+        result = self.result
+
+        result.inserted_count += api_result['nInserted']
+        result.matched_count += api_result['nMatched']
+        result.modified_count += api_result['nModified']
+        result.deleted_count += api_result['nRemoved']
+        result.upserted_count += api_result['nUpserted']
+        result.write_concern_errors.extend(api_result.get('writeConcernErrors', []))
+
+        failed = set()
+        for error in api_result.get('writeErrors', []):
+            index = error['index']
+            operation, document = operations[index][:2]
+            failed.add(index)
+            result.errors.append(EasyDict({
+                'index': indexes[index],
+                'operation': operation,
+                'document': document,
+                'code': error.get('code'),
+                'message': error.get('errmsg'),
+            }))
+
+        # ordered bulks stop at the first error, so nothing after it was written
+        executed = min(failed) if self.ordered and failed else len(operations)
+
+        for index in range(executed):
+            operation, document, son = operations[index][:3]
+            if index in failed or operation not in ('insert', 'upsert'):
+                continue
+
+            document._id = son['_id']
+            if operation == 'insert':
+                result.inserted_ids.append(son['_id'])
+
+        for upserted in api_result.get('upserted', []):
+            result.upserted_ids.append(upserted['_id'])
+
+        return not (self.ordered and failed)
+
+    @abstractmethod
+    def execute(self, *args, **kwargs):
+        pass
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+def _wrap(value, owner):
+    # lists and dicts nested in tracked values report their changes to the value holding them
+    if isinstance(value, list):
+        return TrackedList(value, owner=owner)
+    if isinstance(value, dict):
+        return TrackedDict(value, owner=owner)
+    return value
+
+
+def _changes(method):
+    def change(self, *args, **kwargs):
+        self.mark_as_changed()
+        return method(self, *args, **kwargs)
+
+    change.__name__ = method.__name__
+    return change
+
+
+class TrackedList(list):
+    '''
+    List value of a document loaded from the database (see `BaseDocument.get_changes`).
+
+    It remembers how many items it was loaded with, and whether it was changed in any way other
+    than appending items, so the appended items can be pushed instead of setting the whole list.
+    '''
+
+    __slots__ = ('owner', 'loaded_length', 'is_changed')
+
+    def __init__(self, values=(), owner=None, loaded_length=None):
+        super(TrackedList, self).__init__(_wrap(value, self) for value in values)
+        self.owner = owner
+        self.loaded_length = len(self) if loaded_length is None else loaded_length
+        self.is_changed = False
+
+    def mark_as_changed(self):
+        self.is_changed = True
+        if self.owner is not None:
+            self.owner.mark_as_changed()
+
+    def _appends(method):
+        def append(self, *args, **kwargs):
+            # only lists of documents can have items pushed, nested lists are set as a whole
+            if self.owner is not None:
+                self.owner.mark_as_changed()
+            return method(self, *args, **kwargs)
+
+        append.__name__ = method.__name__
+        return append
+
+    append = _appends(list.append)
+    extend = _appends(list.extend)
+    __iadd__ = _appends(list.__iadd__)
+
+    del _appends
+
+    __setitem__ = _changes(list.__setitem__)
+    __delitem__ = _changes(list.__delitem__)
+    __imul__ = _changes(list.__imul__)
+    insert = _changes(list.insert)
+    pop = _changes(list.pop)
+    remove = _changes(list.remove)
+    reverse = _changes(list.reverse)
+    sort = _changes(list.sort)
+    clear = _changes(list.clear)
+
+    @property
+    def appended(self):
+        return len(self) - self.loaded_length
+
+    def empty(self):
+        # an empty copy that still remembers the loaded length, for lists refilled in place
+        values = TrackedList(owner=self.owner, loaded_length=self.loaded_length)
+        values.is_changed = self.is_changed
+        return values
+
+
+class TrackedDict(dict):
+    '''
+    Dict value of a document loaded from the database, which knows if it (or any list or dict in
+    it) was changed since.
+    '''
+
+    __slots__ = ('owner', 'is_changed')
+
+    def __init__(self, values=(), owner=None):
+        super(TrackedDict, self).__init__(values)
+        for key, value in self.items():
+            dict.__setitem__(self, key, _wrap(value, self))
+        self.owner = owner
+        self.is_changed = False
+
+    def mark_as_changed(self):
+        self.is_changed = True
+        if self.owner is not None:
+            self.owner.mark_as_changed()
+
+    __setitem__ = _changes(dict.__setitem__)
+    __delitem__ = _changes(dict.__delitem__)
+    pop = _changes(dict.pop)
+    popitem = _changes(dict.popitem)
+    setdefault = _changes(dict.setdefault)
+    update = _changes(dict.update)
+    clear = _changes(dict.clear)
+
+
+def track_value(field, value):
+    '''
+    Returns the given value of a document loaded from the database ready to have its changes
+    found: embedded documents start tracking their own fields and lists and dicts become
+    `TrackedList` and `TrackedDict`. Referenced documents are left alone, as they track the
+    changes made to them themselves.
+    '''
+    from motorengine.fields.embedded_document_field import EmbeddedDocumentField
+    from motorengine.fields.list_field import ListField
+
+    if isinstance(field, EmbeddedDocumentField):
+        if value is not None:
+            value._track_changes()
+    elif isinstance(value, list):
+        if isinstance(field, ListField) and isinstance(field._base_field, EmbeddedDocumentField):
+            for item in value:
+                if item is not None:
+                    item._track_changes()
+        value = TrackedList(value)
+    elif isinstance(value, dict):
+        value = TrackedDict(value)
+
+    return value
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections.abc import MutableMapping
+
+
+# name of the slot holding the value of each field in compact documents
+VALUE_SLOT = '_value_%s'
+
+# instance attributes every compact document keeps in slots
+COMPACT_SLOTS = (
+    '_id', '_reference_loaded_fields', 'is_partly_loaded', '_dynamic_fields', '_dynamic_values',
+    '_changed_fields'
+)
+
+
+class CompactValues(MutableMapping):
+    '''
+    Mapping view over the values of a compact document (one with `__compact__ = True`).
+
+    Values of fields with a slot in the document class are read from and written to that slot,
+    any other value (dynamic fields, mostly) is kept in the document's `_dynamic_values` dict,
+    which is only created when needed.
+    '''
+
+    __slots__ = ('_document', )
+
+    def __init__(self, document):
+        self._document = document
+
+    def __getitem__(self, name):
+        slot = self._document._value_slots.get(name)
+
+        if slot is not None:
+            try:
+                return slot.__get__(self._document)
+            except AttributeError:
+                raise KeyError(name)
+
+        dynamic_values = self._document._dynamic_values
+        if dynamic_values is None:
+            raise KeyError(name)
+
+        return dynamic_values[name]
+
+    def __setitem__(self, name, value):
+        slot = self._document._value_slots.get(name)
+
+        if slot is not None:
+            slot.__set__(self._document, value)
+            return
+
+        if self._document._dynamic_values is None:
+            self._document._dynamic_values = {}
+
+        self._document._dynamic_values[name] = value
+
+    def __delitem__(self, name):
+        slot = self._document._value_slots.get(name)
+
+        if slot is not None:
+            try:
+                slot.__delete__(self._document)
+            except AttributeError:
+                raise KeyError(name)
+            return
+
+        if self._document._dynamic_values is None:
+            raise KeyError(name)
+
+        del self._document._dynamic_values[name]
+
+    def __contains__(self, name):
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        for name in self._document._value_slots:
+            if name in self:
+                yield name
+
+        if self._document._dynamic_values is not None:
+            for name in self._document._dynamic_values:
+                yield name
+
+    def __len__(self):
+        return sum(1 for name in self)
@@ -4,12 +4,14 @@
 from abc import ABCMeta
 from abc import abstractmethod
 from six import with_metaclass
+from bson.raw_bson import RawBSONDocument
 
 
 class BaseDatabase(with_metaclass(ABCMeta)):
     def __init__(self, connection, database):
         self.connection = connection
         self.database = database
+        self._collections = {}
 
     @abstractmethod
     def ping(self, *args, **kwargs):
@@ -18,11 +20,36 @@ class BaseDatabase(with_metaclass(ABCMeta)):
     def disconnect(self):
         return self.connection.close()
 
+    def get_collection(self, name, raw_bson=False, **options):
+        '''
+        Returns the handle of the collection with the given name, reading documents as raw
+        BSON if `raw_bson` is True and with the given `read_preference`, `read_concern` and
+        `write_concern` options. Handles are created once and reused afterwards.
+        '''
+        collections = object.__getattribute__(self, '_collections')
+        key = (name, raw_bson)
+        if options:
+            # the driver's options can't be hashed, so they are told apart by their documents
+            key += tuple(sorted((option, repr(value.document)) for option, value in options.items()))
+
+        collection = collections.get(key)
+        if collection is None:
+            collection = getattr(object.__getattribute__(self, 'database'), name)
+            if raw_bson:
+                options['codec_options'] = collection.codec_options.with_options(
+                    document_class=RawBSONDocument
+                )
+            if options:
+                collection = collection.with_options(**options)
+            collections[key] = collection
+
+        return collection
+
     def __getattribute__(self, name):
-        if name in ['ping', 'connection', 'database', 'disconnect']:
+        if name in ['ping', 'connection', 'database', 'disconnect', 'get_collection', '_collections']:
             return object.__getattribute__(self, name)
 
         return getattr(self.database, name)
 
     def __getitem__(self, val):
-        return getattr(self.database, val)
+        return self.get_collection(val)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from motorengine.errors import LoadReferencesRequiredError
+
+
+class FieldDescriptor(object):
+    '''
+    Data descriptor installed by `DocumentMetaClass` in document classes for each of their fields.
+
+    Reading the attribute from an instance returns the field value, while reading it from the
+    document class returns the field itself (so `User.email` can still be used in queries).
+    '''
+
+    def __init__(self, field, name):
+        self.field = field
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self.field
+
+        return self.field.get_value(instance._values.get(self.name, None))
+
+    def __set__(self, instance, value):
+        instance._values[self.name] = value
+        instance._mark_as_changed(self.name)
+
+
+class SlotFieldDescriptor(FieldDescriptor):
+    '''
+    Field descriptor for compact documents, which keep the field value in a slot of the instance.
+    '''
+
+    def __init__(self, field, name, slot):
+        super(SlotFieldDescriptor, self).__init__(field, name)
+        self.slot = slot
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self.field
+
+        try:
+            value = self.slot.__get__(instance)
+        except AttributeError:
+            value = None
+
+        return self.field.get_value(value)
+
+    def __set__(self, instance, value):
+        self.slot.__set__(instance, value)
+        instance._mark_as_changed(self.name)
+
+
+class ReferenceFieldDescriptor(FieldDescriptor):
+    '''
+    Field descriptor for reference fields. Raises `LoadReferencesRequiredError` if the referenced
+    document was not loaded yet.
+    '''
+
+    def __get__(self, instance, owner):
+        value = super(ReferenceFieldDescriptor, self).__get__(instance, owner)
+
+        if instance is None:
+            return value
+
+        if value is not None and not isinstance(value, self.field.reference_type):
+            message = "The property '%s' can't be accessed before calling 'load_references'" + \
+                " on its instance first (%s) or setting __lazy__ to False in the %s class."
+
+            raise LoadReferencesRequiredError(
+                message % (self.name, instance.__class__.__name__, instance.__class__.__name__)
+            )
+
+        return value
+
+
+class SlotReferenceFieldDescriptor(ReferenceFieldDescriptor, SlotFieldDescriptor):
+    pass
@@ -1,20 +1,32 @@
 from abc import ABCMeta
 from abc import abstractmethod
+from itertools import chain
 
-from motorengine.errors import InvalidDocumentError, LoadReferencesRequiredError
+from motorengine.base.changes import TrackedDict, TrackedList, track_value
+from motorengine.base.raw import RawElements, RawValues
+from motorengine.errors import InvalidDocumentError
 
 
 AUTHORIZED_FIELDS = [
-    '_id', '_values', '_reference_loaded_fields', 'is_partly_loaded'
+    '_id', '_values', '_reference_loaded_fields', 'is_partly_loaded',
+    '_dynamic_fields', '_dynamic_values', '_changed_fields'
 ]
 
 
 class BaseDocument(metaclass=ABCMeta):
+    # compact documents (__compact__ = True) get their slots from DocumentMetaClass
+    __slots__ = ()
+
     def __init__(self, _is_partly_loaded=False, _reference_loaded_fields=None, **kw):
         from motorengine.fields.dynamic_field import DynamicField
 
         self._id = kw.pop('_id', None)
-        self._values = {}
+        self._dynamic_fields = None
+        self._changed_fields = None
+        if self.__compact__:
+            self._dynamic_values = None
+        else:
+            self._values = {}
         self.is_partly_loaded = _is_partly_loaded
 
         if _reference_loaded_fields:
@@ -22,16 +34,44 @@ class BaseDocument(metaclass=ABCMeta):
         else:
             self._reference_loaded_fields = {}
 
+        values = self._values
         for key, field in self._fields.items():
             if callable(field.default):
-                self._values[field.name] = field.default()
+                values[field.name] = field.default()
             else:
-                self._values[field.name] = field.default
+                values[field.name] = field.default
 
         for key, value in kw.items():
             if key not in self._fields:
-                self._fields[key] = DynamicField(db_field="_%s" % key.lstrip('_'))
-            self._values[key] = value
+                self._add_dynamic_field(key, DynamicField(db_field="_%s" % key.lstrip('_')))
+            values[key] = value
+
+    def _add_dynamic_field(self, name, field):
+        # dynamic fields belong to this instance only, the class schema in
+        # _fields is never changed by the documents
+        if self._dynamic_fields is None:
+            self._dynamic_fields = {}
+        self._dynamic_fields[name] = field
+
+    def _get_dynamic_fields(self):
+        # documents loaded in raw BSON mode only find their dynamic fields when asked to
+        if not self.__compact__ and self._values.__class__ is RawValues:
+            self._values.load_dynamic_fields()
+        return self._dynamic_fields
+
+    def _get_field(self, name):
+        field = self._fields.get(name)
+        if field is None:
+            dynamic_fields = self._get_dynamic_fields()
+            if dynamic_fields:
+                field = dynamic_fields.get(name)
+        return field
+
+    def _iter_fields(self):
+        dynamic_fields = self._get_dynamic_fields()
+        if dynamic_fields:
+            return chain(self._fields.items(), dynamic_fields.items())
+        return self._fields.items()
 
     @classmethod
     @abstractmethod
@@ -72,14 +112,29 @@ class BaseDocument(metaclass=ABCMeta):
 
     @classmethod
     def from_son(cls, dic, _is_partly_loaded=False, _reference_loaded_fields=None):
+        if isinstance(dic, RawElements):
+            if not cls.__compact__:
+                return cls.from_raw_bson(
+                    dic, _is_partly_loaded=_is_partly_loaded,
+                    _reference_loaded_fields=_reference_loaded_fields
+                )
+
+            # compact documents keep their values in slots, so they are decoded right away
+            dic = dic.to_dict()
+            dic.pop('_cls', None)
+
         field_values = {}
         _object_id = dic.pop('_id', None)
+        fields_by_db_name = cls._fields_by_db_name
         for name, value in dic.items():
-            field = cls.get_field_by_db_name(name)
+            field = fields_by_db_name.get(name)
+            if field is None and name.startswith('_'):
+                field = cls.get_field_by_db_name(name)
             if field:
                 field_values[field.name] = field.from_son(value)
             else:
-                field_values[name] = value
+                # dynamic fields are stored with a leading underscore
+                field_values[name.lstrip('_')] = value
         field_values["_id"] = _object_id
 
         return cls(
@@ -88,10 +143,25 @@ class BaseDocument(metaclass=ABCMeta):
             **field_values
         )
 
+    @classmethod
+    def from_raw_bson(cls, elements, _is_partly_loaded=False, _reference_loaded_fields=None):
+        '''
+        Creates a document whose field values are decoded from the given `RawElements` only
+        when they are first accessed.
+        '''
+        document = cls.__new__(cls)
+        document._id = elements.get('_id')
+        document._dynamic_fields = None
+        document._changed_fields = None
+        document.is_partly_loaded = _is_partly_loaded
+        document._reference_loaded_fields = _reference_loaded_fields or {}
+        document._values = RawValues(document, elements)
+        return document
+
     def to_son(self):
         data = dict()
 
-        for name, field in self._fields.items():
+        for name, field in self._iter_fields():
             value = self.get_field_value(name)
             if field.sparse and value is None:
                 continue
@@ -99,6 +169,109 @@ class BaseDocument(metaclass=ABCMeta):
 
         return data
 
+    def _iter_loaded_values(self):
+        # values of documents loaded in raw BSON mode that were never decoded can't have changed
+        values = self._values
+        if values.__class__ is RawValues:
+            return values.decoded_items()
+        return list(values.items())
+
+    def _track_changes(self):
+        # called for documents loaded from the database, so their changes can be found when saved.
+        # They share an empty tuple until their first change
+        self._changed_fields = ()
+
+        values = self._values
+        for name, value in self._iter_loaded_values():
+            tracked = track_value(self._fields.get(name), value)
+            if tracked is not value:
+                values[name] = tracked
+
+    def _clear_changes(self):
+        # the saved values are the loaded ones from now on
+        if self._changed_fields is not None:
+            self._track_changes()
+
+    def _mark_as_changed(self, name):
+        changed_fields = self._changed_fields
+        if changed_fields is None:
+            return
+
+        if not changed_fields:
+            changed_fields = self._changed_fields = set()
+        changed_fields.add(name)
+
+    @staticmethod
+    def _add_value_changes(changes, value, son, path):
+        if isinstance(value, BaseDocument):
+            # referenced documents are saved on their own
+            if not isinstance(son, dict):
+                return
+
+            if value._changed_fields is None:
+                changes.setdefault('$set', {})[path] = son
+            else:
+                # embedded documents only get their changed fields set
+                value._add_changes(changes, son, path + '.')
+
+        elif isinstance(value, TrackedList):
+            if value.is_changed or value.appended < 0:
+                changes.setdefault('$set', {})[path] = son
+                return
+
+            item_changes = {}
+            for item, item_son in zip(value[:value.loaded_length], son):
+                BaseDocument._add_value_changes(item_changes, item, item_son, path)
+
+            if item_changes:
+                changes.setdefault('$set', {})[path] = son
+            elif value.appended:
+                changes.setdefault('$push', {})[path] = {'$each': son[value.loaded_length:]}
+
+        elif isinstance(value, TrackedDict):
+            if value.is_changed:
+                changes.setdefault('$set', {})[path] = son
+
+        elif isinstance(value, (list, dict)):
+            # lists and dicts put in the document without assigning them can't be tracked
+            changes.setdefault('$set', {})[path] = son
+
+    def _add_changes(self, changes, son, prefix=''):
+        changed_fields = self._changed_fields
+        values = dict(self._iter_loaded_values())
+
+        for name, field in self._iter_fields():
+            key = field.db_field
+            path = prefix + key
+
+            if name in changed_fields:
+                if key in son:
+                    changes.setdefault('$set', {})[path] = son[key]
+                else:
+                    changes.setdefault('$unset', {})[path] = ''
+            elif key in son:
+                self._add_value_changes(changes, values.get(name), son[key], path)
+
+    def get_changes(self, son=None):
+        '''
+        Returns the `$set`, `$unset` and `$push` operations needed to save the changes made to the
+        instance since it was loaded (its current values given as `son`, if already built), or
+        None if the changes are not known, because the document wasn't loaded from the database,
+        was partly loaded or its class has `__partial_updates__` set to False.
+
+        Fields are changed when assigned to, embedded documents track their own fields and items
+        appended to lists are pushed. Lists and dicts changed in any other way are set whole.
+        '''
+        if self._changed_fields is None or not self.__partial_updates__:
+            return None
+
+        if son is None:
+            son = self.to_son()
+
+        changes = {}
+        self._add_changes(changes, son)
+        return changes
+
     def to_dict(self):
         data = self.to_son()
         data.update({'id': self._id})
@@ -108,7 +281,7 @@ class BaseDocument(metaclass=ABCMeta):
         return self.validate_fields()
 
     def validate_fields(self):
-        for name, field in self._fields.items():
+        for name, field in self._iter_fields():
 
             value = self.get_field_value(name)
 
@@ -153,21 +326,21 @@ class BaseDocument(metaclass=ABCMeta):
         return results
 
     @staticmethod
-    def _get_load_function(document, field_name, document_type):
+    def _get_load_queryset(document, field_name, document_type):
         if field_name in document._reference_loaded_fields:
             fields = document._reference_loaded_fields[field_name]
-            return document_type.objects.fields(**fields).get
-        return document_type.objects.get
+            return document_type.objects.fields(**fields)
+        return document_type.objects
 
     def find_reference_field(self, document, results, field_name, field):
         if self.is_reference_field(field):
             value = document._values.get(field_name, None)
-            load_function = self._get_load_function(
+            load_queryset = self._get_load_queryset(
                 document, field_name, field.reference_type
             )
             if value is not None:
                 results.append([
-                    load_function,
+                    load_queryset,
                     value,
                     document._values,
                     field_name,
@@ -182,18 +355,22 @@ class BaseDocument(metaclass=ABCMeta):
                 document_type = values[0].__class__
                 if isinstance(field._base_field, ReferenceField):
                     document_type = field._base_field.reference_type
-                    load_function = self._get_load_function(
+                    load_queryset = self._get_load_queryset(
                         document, field_name, document_type
                     )
                     for value in values:
                         results.append([
-                            load_function,
+                            load_queryset,
                             value,
                             document._values,
                             field_name,
                             self.fill_list_values_collection
                         ])
-                    document._values[field_name] = []
+                    # the loaded documents are appended back to the list by resolve_references
+                    if isinstance(values, TrackedList):
+                        document._values[field_name] = values.empty()
+                    else:
+                        document._values[field_name] = []
                 else:
                     self.find_references(document=document_type, results=results)
 
@@ -204,56 +381,46 @@ class BaseDocument(metaclass=ABCMeta):
                 self.find_references(document=value, results=results)
 
     def get_field_value(self, name):
-        if name not in self._fields:
+        field = self._get_field(name)
+        if field is None:
             raise ValueError("Field %s not found in instance of %s." % (
                 name,
                 self.__class__.__name__
             ))
 
-        field = self._fields[name]
         value = field.get_value(self._values.get(name, None))
 
         return value
 
-    def __getattribute__(self, name):
-        if name in ['_fields']:
-            return object.__getattribute__(self, name)
+    def __getattr__(self, name):
+        # declared fields are read through their descriptors, so this is only
+        # reached for dynamic fields and missing attributes
+        if name not in AUTHORIZED_FIELDS:
+            dynamic_fields = self._get_dynamic_fields()
+            if dynamic_fields and name in dynamic_fields:
+                return dynamic_fields[name].get_value(self._values.get(name, None))
 
-        if name in self._fields:
-            field = self._fields[name]
-            is_reference_field = self.is_reference_field(field)
-            value = field.get_value(self._values.get(name, None))
-
-            if is_reference_field and value is not None and not isinstance(value, field.reference_type):
-                message = "The property '%s' can't be accessed before calling 'load_references'" + \
-                    " on its instance first (%s) or setting __lazy__ to False in the %s class."
-
-                raise LoadReferencesRequiredError(
-                    message % (name, self.__class__.__name__, self.__class__.__name__)
-                )
-
-            return value
-
-        return object.__getattribute__(self, name)
+        raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
 
     def __setattr__(self, name, value):
         from motorengine.fields.dynamic_field import DynamicField
 
-        if name not in AUTHORIZED_FIELDS and name not in self._fields:
-            self._fields[name] = DynamicField(db_field="_%s" % name)
-
-        if name in self._fields:
-            self._values[name] = value
+        if name in AUTHORIZED_FIELDS:
+            object.__setattr__(self, name, value)
             return
 
-        object.__setattr__(self, name, value)
+        if self._get_field(name) is None:
+            self._add_dynamic_field(name, DynamicField(db_field="_%s" % name))
+
+        self._values[name] = value
+        self._mark_as_changed(name)
 
     @classmethod
     def get_field_by_db_name(cls, name):
-        for field_name, field in cls._fields.items():
-            if name == field.db_field or name.lstrip("_") == field.db_field:
-                return field
-        return None
+        field = cls._fields_by_db_name.get(name)
+        if field is None and name.startswith('_'):
+            field = cls._fields_by_db_name.get(name.lstrip('_'))
+        return field
 
     @classmethod
     def get_fields(cls, name, fields=None):
@@ -263,13 +430,14 @@ class BaseDocument(metaclass=ABCMeta):
         if fields is None:
             fields = []
 
+        # undeclared names are queried the way dynamic fields are stored
         if '.' not in name:
-            dyn_field = DynamicField(db_field="%s" % name)
+            dyn_field = DynamicField(db_field="_%s" % name.lstrip('_'))
             fields.append(cls._fields.get(name, dyn_field))
             return fields
 
         field_values = name.split('.')
-        dyn_field = DynamicField(db_field="%s" % field_values[0])
+        dyn_field = DynamicField(db_field="_%s" % field_values[0].lstrip('_'))
         obj = cls._fields.get(field_values[0], dyn_field)
         fields.append(obj)
 
@@ -277,6 +445,10 @@ class BaseDocument(metaclass=ABCMeta):
             obj.embedded_type.get_fields(".".join(field_values[1:]), fields=fields)
 
         if isinstance(obj, (ListField, )):
-            obj.item_type.get_fields(".".join(field_values[1:]), fields=fields)
+            if hasattr(obj.item_type, 'get_fields'):
+                obj.item_type.get_fields(".".join(field_values[1:]), fields=fields)
+            else:
+                # positions in lists of values are kept as they are
+                fields.extend(field_values[1:])
 
         return fields
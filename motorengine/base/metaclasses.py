@@ -2,14 +2,37 @@
 
 from abc import ABCMeta
 
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+
 from motorengine.fields import BaseField
 from motorengine.base.document import BaseDocument
+from motorengine.base.compact import CompactValues, COMPACT_SLOTS, VALUE_SLOT
+from motorengine.base.descriptors import (
+    FieldDescriptor, ReferenceFieldDescriptor, SlotFieldDescriptor, SlotReferenceFieldDescriptor
+)
 from motorengine.errors import InvalidDocumentError
 
 
-class classproperty(property):
-    def __get__(self, cls, owner):
-        return classmethod(self.fget).__get__(None, owner)()
+class QuerySetProperty(object):
+    '''
+    Descriptor for the `objects` attribute of document classes. The queryset is created on first
+    access and then reused, as querysets are never changed by their modifiers.
+    '''
+
+    def __init__(self, query_set_class, document_class):
+        self.query_set_class = query_set_class
+        self.document_class = document_class
+        self.queryset = None
+
+    def __get__(self, instance, owner):
+        queryset = self.queryset
+        if queryset is None:
+            queryset = self.queryset = self.query_set_class(self.document_class)
+        return queryset
+
+    def clear(self):
+        self.queryset = None
 
 
 class DocumentMetaClass(ABCMeta):
@@ -62,16 +85,54 @@ class DocumentMetaClass(ABCMeta):
             for k, v in attrs['_db_field_map'].items()
         }
 
+        compact = attrs.get('__compact__', any(
+            getattr(base, '__compact__', False) for base in flattened_bases
+        ))
+
+        if compact:
+            attrs['__slots__'] = cls._get_compact_slots(flattened_bases, doc_fields)
+            if '_values' not in attrs:
+                attrs['_values'] = property(CompactValues)
+
         new_class = super_new(cls, name, bases, attrs)
         new_class.__hierarchy__ = None
         new_class.__child_classes__ = []
 
+        if '__compact__' not in attrs:
+            new_class.__compact__ = compact
+
+        if compact:
+            value_slots = dict(getattr(new_class, '_value_slots', {}))
+            for field_name in doc_fields:
+                slot = new_class.__dict__.get(VALUE_SLOT % field_name)
+                if slot is not None:
+                    value_slots[field_name] = slot
+            new_class._value_slots = value_slots
+
         if '__lazy__' not in attrs:
             new_class.__lazy__ = True
 
+        if '__partial_updates__' not in attrs:
+            # inherited from the bases, like __compact__
+            new_class.__partial_updates__ = getattr(new_class, '__partial_updates__', True)
+
         if '__alias__' not in attrs:
             new_class.__alias__ = None
 
+        if '__router__' not in attrs:
+            new_class.__router__ = None
+
+        for option in ('__read_preference__', '__read_concern__', '__write_concern__'):
+            if option not in attrs:
+                setattr(new_class, option, None)
+
+        # levels and dicts are wrapped like the read_concern and write_concern modifiers do
+        if new_class.__read_concern__ is not None and not isinstance(new_class.__read_concern__, ReadConcern):
+            new_class.__read_concern__ = ReadConcern(new_class.__read_concern__)
+
+        if isinstance(new_class.__write_concern__, dict):
+            new_class.__write_concern__ = WriteConcern(**new_class.__write_concern__)
+
         if '__inherit__' not in attrs:
             new_class.__inherit__ = False
 
@@ -113,10 +174,62 @@ class DocumentMetaClass(ABCMeta):
         elif '_cls' in new_class._fields:
             del new_class._fields['_cls']
 
-        setattr(new_class, 'objects', classproperty(lambda *args, **kw: cls.query_set_class(new_class)))
+        new_class._fields_by_db_name = cls._get_fields_by_db_name(new_class._fields)
+
+        value_slots = new_class._value_slots if compact else {}
+        for field_name, field in new_class._fields.items():
+            setattr(new_class, field_name, cls._get_field_descriptor(
+                field, field_name, value_slots.get(field_name)
+            ))
+
+        setattr(new_class, 'objects', QuerySetProperty(cls.query_set_class, new_class))
 
         return new_class
 
+    @staticmethod
+    def _get_field_descriptor(field, field_name, slot=None):
+        if slot is not None:
+            if BaseDocument.is_reference_field(field):
+                return SlotReferenceFieldDescriptor(field, field_name, slot)
+            return SlotFieldDescriptor(field, field_name, slot)
+
+        if BaseDocument.is_reference_field(field):
+            return ReferenceFieldDescriptor(field, field_name)
+        return FieldDescriptor(field, field_name)
+
+    @staticmethod
+    def _get_compact_slots(flattened_bases, fields):
+        # the document attributes are only declared by the first compact class
+        # in the hierarchy, subclasses just add slots for their own fields
+        compact_bases = [
+            base for base in flattened_bases
+            if getattr(base, '__compact__', False)
+        ]
+
+        slotted_fields = set()
+        for base in compact_bases:
+            slotted_fields.update(base._value_slots)
+
+        slots = [] if compact_bases else list(COMPACT_SLOTS)
+        slots.extend(
+            VALUE_SLOT % field_name
+            for field_name in sorted(fields)
+            if field_name not in slotted_fields
+        )
+
+        return tuple(slots)
+
+    @staticmethod
+    def _get_fields_by_db_name(fields):
+        # maps every name a field can have in a stored document to the field,
+        # including the underscore prefixed names used for dynamic fields
+        fields_by_db_name = {}
+        for field in fields.values():
+            fields_by_db_name['_%s' % field.db_field] = field
+        for field in fields.values():
+            fields_by_db_name[field.db_field] = field
+        return fields_by_db_name
+
     @staticmethod
     def _get_collection(new_class, flattened_bases):
         _flattened_bases = flattened_bases[::-1][2:]
@@ -136,6 +249,9 @@ class DocumentMetaClass(ABCMeta):
             for base in _flattened_bases:
                 if not base.__abstract__:
                     base.__child_classes__.append(new_class)
+                    # the queryset of the base filters by its child classes
+                    if isinstance(base.__dict__.get('objects'), QuerySetProperty):
+                        base.__dict__['objects'].clear()
         new_class.__hierarchy__ = '.'.join(
             [cls.__name__ for cls in _flattened_bases if not cls.__abstract__] + [new_class.__name__]
         )
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from easydict import EasyDict
+
+
+# pool settings of `connect` and the client options they are passed as
+POOL_OPTIONS = {
+    'max_pool_size': 'maxPoolSize',
+    'min_pool_size': 'minPoolSize',
+    'max_idle_time_ms': 'maxIdleTimeMS',
+    'wait_queue_timeout_ms': 'waitQueueTimeoutMS',
+}
+
+
+def get_client_settings(settings):
+    '''
+    Returns the settings of a connection as client options, with its pool settings renamed to
+    the driver options.
+    '''
+    settings = dict(settings)
+
+    for name, option in POOL_OPTIONS.items():
+        value = settings.pop(name, None)
+        if value is not None:
+            settings[option] = value
+
+    return settings
+
+
+def get_servers_stats(client):
+    '''
+    Returns how many connections of the pool of each server of a client are checked out and
+    available. The driver has no public API for the state of its pools, so this reads its
+    internals and raises a `RuntimeError` naming the missing attribute if they change.
+    '''
+    delegate = getattr(client, 'delegate', client)
+
+    try:
+        # the topology only has servers once the client is connected
+        servers = list(delegate._topology._servers.items())
+        return dict(
+            ('%s:%s' % address, {
+                'checked_out': server.pool.active_sockets,
+                'available': len(server.pool.sockets),
+            })
+            for address, server in servers
+        )
+    except AttributeError as error:
+        raise RuntimeError(
+            "Can't read the connection pools of this version of pymongo (%s). "
+            "The pool stats only support the pymongo versions motorengine depends on." % error
+        )
+
+
+def get_pool_stats(client, settings):
+    '''
+    Returns the size settings of the pools of a client and how many of their connections are
+    checked out and available, in total and by server.
+
+    The time operations wait to check connections out is not included: pymongo only reports
+    check outs with connection pool events from 3.9 on.
+    '''
+    delegate = getattr(client, 'delegate', client)
+    servers = get_servers_stats(client)
+
+    return EasyDict({
+        'max_pool_size': delegate.max_pool_size,
+        'min_pool_size': delegate.min_pool_size,
+        'max_idle_time_ms': settings.get('maxIdleTimeMS'),
+        'wait_queue_timeout_ms': settings.get('waitQueueTimeoutMS'),
+        'checked_out': sum(server['checked_out'] for server in servers.values()),
+        'available': sum(server['available'] for server in servers.values()),
+        'servers': servers,
+    })
@@ -1,20 +1,36 @@
 # -*- coding: utf-8 -*-
 
+import base64
+from collections import OrderedDict
+from copy import copy
 from datetime import datetime
+from functools import cmp_to_key
 
 from six import with_metaclass
+from easydict import EasyDict
+from bson import BSON
+from bson.raw_bson import RawBSONDocument
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import ReadPreference
+from pymongo.write_concern import WriteConcern
 
 from abc import ABCMeta
 from abc import abstractmethod
 
-from motorengine import ASCENDING
+from motorengine import ASCENDING, DESCENDING
+from motorengine.errors import UnroutableQueryError
+from motorengine.base.raw import RawElements
 from motorengine.query_builder.field_list import QueryFieldList
-from motorengine.query_builder.transform import validate_fields
+from motorengine.query_builder.transform import validate_fields, transform_update
 from motorengine.query_builder.node import Q, QCombination, QNot
 
 
 class BaseQuerySet(with_metaclass(ABCMeta)):
     DEFAULT_LIMIT = 1000
+    DEFAULT_BATCH_SIZE = 100
+    DEFAULT_PAGE_SIZE = 20
+    DEFAULT_INSERT_CHUNK_SIZE = 1000
+    DEFAULT_INSERTS_IN_FLIGHT = 4
 
     def __init__(self, klass):
         if klass.__abstract__ is True:
@@ -24,6 +40,16 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
         self._limit = None
         self._skip = None
         self._order_fields = []
+        self._batch_size = None
+        self._max_time_ms = None
+        self._no_cursor_timeout = False
+        self._hint = None
+        self._comment = None
+        self._raw_bson = False
+        self._read_preference = None
+        self._read_concern = None
+        self._write_concern = None
+        self._bound_query = None
         self._loaded_fields = QueryFieldList()
         self._reference_loaded_fields = {}
 
@@ -39,28 +65,201 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
     def is_lazy(self):
         return self.__klass__.__lazy__
 
+    def _clone(self, **attributes):
+        # querysets are never changed once created, every modifier returns a changed copy instead
+        queryset = self.__class__.__new__(self.__class__)
+        queryset.__dict__.update(self.__dict__)
+        queryset.__dict__.update(attributes)
+        return queryset
+
     @abstractmethod
     def _get_connection_function(self):
         pass
 
     def _resolve_class(self, doc):
         from motorengine.base import classes_registry
-        klass = doc.pop('_cls', None)
+        if isinstance(doc, RawElements):
+            # only documents of inherited classes are stored with their class
+            klass = doc.get('_cls') if self.__klass__.__inherit__ else None
+        else:
+            klass = doc.pop('_cls', None)
         if not klass:
             return self.__klass__
         return classes_registry.get(klass)
 
+    def _get_document(self, doc, codec_options=None):
+        if isinstance(doc, RawBSONDocument):
+            doc = RawElements(doc.raw, codec_options)
 
-    def coll(self, alias=None):
+        document = self._resolve_class(doc).from_son(
+            doc,
+            # set projections for references (if any)
+            _reference_loaded_fields=self._reference_loaded_fields,
+            # if _loaded_fields is not empty then documents are partly loaded
+            _is_partly_loaded=bool(self._loaded_fields)
+        )
+        # only the changed fields of documents that can be saved are sent when they are
+        if not document.is_partly_loaded and document.__partial_updates__:
+            document._track_changes()
+        return document
+
+    def _get_alias(self, alias=None):
+        if alias is not None:
+            return alias
+        return self.__klass__.__alias__
+
+    def _get_aliases(self, query, alias=None):
+        '''
+        Returns the aliases the query must run in: the given one (or the class one), unless the
+        class has a `__router__`, in which case it's the alias the router tells for the query
+        or all the aliases of the router if it can't tell it.
+        '''
+        router = self.__klass__.__router__
+        if alias is not None or router is None:
+            return [alias]
+
+        routed = router.route_query(self.__klass__, query)
+        if routed is None:
+            return list(router.aliases)
+        return [routed]
+
+    def _route_query(self, query, alias=None):
+        aliases = self._get_aliases(query, alias)
+        if len(aliases) > 1:
+            raise UnroutableQueryError(
+                'The router of {} can\'t tell the alias of the query {}. Either filter by '
+                'the key of the router or pass an alias.'.format(self.__klass__.__name__, query)
+            )
+        return aliases[0]
+
+    def _route_document(self, document, alias=None):
+        router = self.__klass__.__router__
+        if alias is not None or router is None:
+            return alias
+
+        routed = router.route_document(document)
+        if routed is None:
+            raise UnroutableQueryError(
+                'The router of {} can\'t tell the alias of the document {}.'.format(
+                    self.__klass__.__name__, document._id
+                )
+            )
+        return routed
+
+    def _route_chunk(self, documents, sons, alias=None):
+        # splits a chunk of documents to insert by the alias they are routed to
+        if alias is not None or self.__klass__.__router__ is None:
+            return [(alias, documents, sons)]
+
+        chunks = OrderedDict()
+        for document, son in zip(documents, sons):
+            chunk_documents, chunk_sons = chunks.setdefault(self._route_document(document), ([], []))
+            chunk_documents.append(document)
+            chunk_sons.append(son)
+
+        return [
+            (chunk_alias, chunk_documents, chunk_sons)
+            for chunk_alias, (chunk_documents, chunk_sons) in chunks.items()
+        ]
+
+    def _get_alias_queryset(self):
+        # the skip is applied after merging the documents of all the aliases
+        limit = self._limit if self._limit is not None else self.DEFAULT_LIMIT
+        return self._clone(
+            _limit=(self._skip or 0) + limit, _skip=None,
+            _loaded_fields=self._get_loaded_fields_with_sort(self._order_fields)
+        )
+
+    def _merge_documents(self, results):
+        '''
+        Merges the documents loaded from each alias (see `_get_alias_queryset`) in the order
+        of this queryset and applies its skip and limit to them.
+        '''
+        documents = [document for result in results for document in result]
+
+        if self._order_fields:
+            documents.sort(key=self._get_merge_key())
+
+        skip = self._skip or 0
+        limit = self._limit if self._limit is not None else self.DEFAULT_LIMIT
+        return documents[skip:skip + limit]
+
+    def _get_merge_key(self):
+        '''
+        Returns the sort key of the documents loaded from several aliases in the order of this
+        queryset. None values sort first, like null values in MongoDB.
+        '''
+        order_fields = self._order_fields
+
+        def compare(key, other_key):
+            for (db_field, direction), value, other_value in zip(order_fields, key, other_key):
+                value = (value is not None, value)
+                other_value = (other_value is not None, other_value)
+                if value != other_value:
+                    result = -1 if value < other_value else 1
+                    return -result if direction == DESCENDING else result
+            return 0
+
+        to_key = cmp_to_key(compare)
+        return lambda document: to_key(self._get_page_key(document, order_fields))
+
+    @staticmethod
+    def _merge_found(documents):
+        return next((document for document in documents if document is not None), None)
+
+    def _get_database(self, alias=None):
         get_connection = self._get_connection_function()
+        alias = self._get_alias(alias)
         if alias is not None:
-            conn = get_connection(alias=alias)
-        elif self.__klass__.__alias__ is not None:
-            conn = get_connection(alias=self.__klass__.__alias__)
-        else:
-            conn = get_connection()
+            return get_connection(alias=alias)
+        return get_connection()
+
+    def _get_collection_options(self):
+        # options set in the queryset take precedence over the document class ones
+        klass = self.__klass__
+        read_preference = self._read_preference
+        if read_preference is None:
+            read_preference = klass.__read_preference__
+        read_concern = self._read_concern
+        if read_concern is None:
+            read_concern = klass.__read_concern__
+        write_concern = self._write_concern
+        if write_concern is None:
+            write_concern = klass.__write_concern__
+
+        options = {}
+        if read_preference is not None:
+            options['read_preference'] = read_preference
+        if read_concern is not None:
+            options['read_concern'] = read_concern
+        if write_concern is not None:
+            options['write_concern'] = write_concern
+        return options
 
-        return conn[self.__klass__.__collection__]
+    def coll(self, alias=None):
+        return self._get_database(alias).get_collection(
+            self.__klass__.__collection__, **self._get_collection_options()
+        )
+
+    def _get_read_coll(self, alias=None):
+        return self._get_database(alias).get_collection(
+            self.__klass__.__collection__, raw_bson=self._raw_bson,
+            **self._get_collection_options()
+        )
+
+    def _get_codec_options(self, alias=None):
+        # options used to decode the values of documents read in raw BSON mode
+        if not self._raw_bson:
+            return None
+        return self.coll(alias).codec_options.with_options(document_class=dict)
+
+    def is_index_ensured(self, alias=None):
+        from motorengine.base import indexes_registry
+        return (self._get_alias(alias), self.__klass__) in indexes_registry
+
+    def _register_index(self, alias=None):
+        from motorengine.base import indexes_registry
+        indexes_registry.add((self._get_alias(alias), self.__klass__))
 
     @abstractmethod
     async def create(self, *args, **kwargs):
@@ -86,6 +285,18 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
     async def bulk_insert(self, *args, **kwargs):
         pass
 
+    @abstractmethod
+    def bulk(self, *args, **kwargs):
+        pass
+
+    @abstractmethod
+    async def modify(self, *args, **kwargs):
+        pass
+
+    @abstractmethod
+    async def pop_one(self, *args, **kwargs):
+        pass
+
     @abstractmethod
     async def get(self, *args, **kwargs):
         pass
@@ -98,6 +309,10 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
     async def count(self, *args, **kwargs):
         pass
 
+    @abstractmethod
+    async def paginate_after(self, *args, **kwargs):
+        pass
+
     @abstractmethod
     async def ensure_index(self, *args, **kwargs):
         pass
@@ -137,14 +352,52 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
 
         return document.validate()
 
-    @staticmethod
-    def transform_definition(definition):
-        from motorengine.fields.base_field import BaseField
-        return {
-            key.db_field if isinstance(key, BaseField) else key: value
-            for key, value in definition.items()
+    def _get_son_to_insert(self, document, document_index):
+        self.update_field_on_save_values(
+            document, document._id is not None
+        )
+        try:
+            is_valid = self.validate_document(document)
+        except Exception as e:
+            raise ValueError(
+                'Validation for document {} in the documents '
+                'you are saving failed with: {}'.format(
+                    document_index,
+                    e
+                )
+            )
+
+        if not is_valid:
+            raise ValueError(
+                'Validation for document {} in the documents you are saving failed.'.format(
+                    document_index
+                )
+            )
+
+        return document.to_son()
+
+    def _get_insert_chunks(self, documents, chunk_size=None, offset=0):
+        '''
+        Serializes the documents to insert `chunk_size` documents at a time, as the chunks are
+        consumed, so only the documents of the chunks being inserted are kept as SON.
+        '''
+        if chunk_size is None:
+            chunk_size = self.DEFAULT_INSERT_CHUNK_SIZE
 
-        }
+        chunk, sons = [], []
+        for document_index, document in enumerate(documents, offset):
+            sons.append(self._get_son_to_insert(document, document_index))
+            chunk.append(document)
+
+            if len(chunk) == chunk_size:
+                yield chunk, sons
+                chunk, sons = [], []
+
+        if chunk:
+            yield chunk, sons
+
+    def transform_definition(self, definition):
+        return transform_update(self.__klass__, definition)
 
     def _check_valid_field_name_to_project(self, field_name, value):
         if '.' not in field_name and (
@@ -235,6 +488,14 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
         from itertools import groupby
         from operator import itemgetter
 
+        queryset = self._clone(
+            _loaded_fields=copy(self._loaded_fields),
+            _reference_loaded_fields=dict(
+                (name, dict(fields))
+                for name, fields in self._reference_loaded_fields.items()
+            )
+        )
+
         operators = ['slice']
         cleaned_fields = []
         for key, value in kwargs.items():
@@ -245,7 +506,7 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
 
             key = '.'.join(parts)
             try:
-                field_name, value = self._check_valid_field_name_to_project(
+                field_name, value = queryset._check_valid_field_name_to_project(
                     key, value
                 )
             except ValueError as e:
@@ -256,16 +517,14 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
         fields = sorted(cleaned_fields, key=itemgetter(1))
         for value, group in groupby(fields, lambda x: x[1]):
             fields = [field for field, value in group]
-            self._loaded_fields += QueryFieldList(
+            queryset._loaded_fields += QueryFieldList(
                 fields, value=value, _only_called=_only_called)
 
-        return self
+        return queryset
 
     def all_fields(self):
-        self._loaded_fields = QueryFieldList(
-            always_include=self._loaded_fields.always_include)
-
-        return self
+        return self._clone(_loaded_fields=QueryFieldList(
+            always_include=self._loaded_fields.always_include))
 
     def get_query_from_filters(self, filters):
         if not filters:
@@ -274,8 +533,84 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
         query = filters.to_query(self.__klass__)
         return query
 
+    def _get_query(self):
+        query = self.get_query_from_filters(self._filters)
+
+        # querysets bound from prepared queries already have their query compiled, filters added
+        # to them afterwards must match as well
+        if self._bound_query is not None:
+            if query:
+                return {'$and': [self._bound_query, query]}
+            return self._bound_query
+
+        return query
+
+    def _get_document_query(self, _id=None, **kwargs):
+        from bson.objectid import ObjectId
+
+        if _id is not None:
+            if not isinstance(_id, ObjectId):
+                _id = ObjectId(_id)
+
+            return {
+                '_id': _id
+            }
+
+        if kwargs:
+            return self.get_query_from_filters(Q(**kwargs))
+
+        if self._bound_query is not None:
+            return self._get_query()
+
+        raise RuntimeError('Either an id or a filter must be provided to get')
+
+    def prepare(self, *arguments, **kwargs):
+        '''
+        Validates and compiles the given filters (see `filter`) once, returning a
+        `PreparedQuery` that can be executed any number of times with the values
+        of its `Param` placeholders::
+
+            find_user = User.objects.prepare(email=Param('email'), active=True)
+            user = await find_user.get(email='heynemann@gmail.com')
+        '''
+        from motorengine.query_builder.prepared import PreparedQuery
+
+        return PreparedQuery(self.filter(*arguments, **kwargs))
+
+    def _get_cursor_options(self):
+        cursor_options = {}
+
+        if self._batch_size:
+            cursor_options['batch_size'] = self._batch_size
+
+        if self._max_time_ms:
+            cursor_options['max_time_ms'] = self._max_time_ms
+
+        if self._no_cursor_timeout:
+            cursor_options['no_cursor_timeout'] = True
+
+        if self._hint is not None:
+            cursor_options['hint'] = self._hint
+
+        if self._comment is not None:
+            cursor_options['comment'] = self._comment
+
+        return cursor_options
+
+    def _get_find_one_and_arguments(self):
+        # find_one_and_update and find_one_and_delete act on the first document in the queryset order
+        arguments = {'projection': self._loaded_fields.to_query(self.__klass__)}
+
+        if self._order_fields:
+            arguments['sort'] = self._order_fields
+
+        if self._max_time_ms:
+            arguments['maxTimeMS'] = self._max_time_ms
+
+        return arguments
+
     def _get_find_cursor(self, alias):
-        find_arguments = {}
+        find_arguments = self._get_cursor_options()
 
         if self._order_fields:
             find_arguments['sort'] = self._order_fields
@@ -286,9 +621,9 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
         if self._skip:
             find_arguments['skip'] = self._skip
 
-        query_filters = self.get_query_from_filters(self._filters)
+        query_filters = self._get_query()
 
-        return self.coll(alias).find(
+        return self._get_read_coll(alias).find(
             query_filters, projection=self._loaded_fields.to_query(self.__klass__),
             **find_arguments
         )
@@ -296,38 +631,108 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
     def filter(self, *arguments, **kwargs):
         if arguments and len(arguments) == 1 and isinstance(arguments[0], (Q, QNot, QCombination)):
             if self._filters:
-                self._filters = self._filters & arguments[0]
+                filters = self._filters & arguments[0]
             else:
-                self._filters = arguments[0]
+                filters = arguments[0]
         else:
             validate_fields(self.__klass__, kwargs)
             if self._filters:
-                self._filters = self._filters & Q(**kwargs)
+                filters = self._filters & Q(**kwargs)
             else:
                 if arguments and len(arguments) == 1 and isinstance(arguments[0], dict):
-                    self._filters = Q(arguments[0])
+                    filters = Q(arguments[0])
                 else:
-                    self._filters = Q(**kwargs)
+                    filters = Q(**kwargs)
 
-        return self
+        return self._clone(_filters=filters)
 
     def filter_not(self, *arguments, **kwargs):
         from motorengine.query_builder.node import Q, QCombination, QNot
 
         if arguments and len(arguments) == 1 and isinstance(arguments[0], (Q, QCombination)):
-            self.filter(QNot(arguments[0]))
-        else:
-            self.filter(QNot(Q(**kwargs)))
+            return self.filter(QNot(arguments[0]))
 
-        return self
+        return self.filter(QNot(Q(**kwargs)))
 
     def skip(self, skip):
-        self._skip = skip
-        return self
+        return self._clone(_skip=skip)
 
     def limit(self, limit):
-        self._limit = limit
-        return self
+        return self._clone(_limit=limit)
+
+    def batch_size(self, batch_size):
+        return self._clone(_batch_size=batch_size)
+
+    def max_time_ms(self, max_time_ms):
+        return self._clone(_max_time_ms=max_time_ms)
+
+    def no_cursor_timeout(self):
+        return self._clone(_no_cursor_timeout=True)
+
+    def hint(self, index):
+        '''
+        Tells MongoDB which index to use for the query. `index` is either the
+        index name or a list of `(field, direction)` tuples, where fields can
+        be given by name or as the field itself.
+        '''
+        from motorengine.fields.base_field import BaseField
+
+        if isinstance(index, (list, tuple)):
+            index_fields = []
+            for field_name, direction in index:
+                if isinstance(field_name, (BaseField, )):
+                    field_name = field_name.db_field
+                elif field_name in self.__klass__._fields:
+                    field_name = self.__klass__._fields[field_name].db_field
+                index_fields.append((field_name, direction))
+            index = index_fields
+
+        return self._clone(_hint=index)
+
+    def comment(self, comment):
+        return self._clone(_comment=comment)
+
+    def read_preference(self, read_preference, tags=None, max_staleness=-1):
+        '''
+        Reads the documents of this queryset with the given read preference (one of the modes in
+        `ReadPreference`), restricted to the replica set members matching any of the given tag
+        sets, if any::
+
+            User.objects.read_preference(ReadPreference.SECONDARY_PREFERRED, tags=[{'dc': 'ny'}])
+
+        Tags and `max_staleness` only apply to reads from secondaries, so a `ValueError` is raised
+        if they are given with `ReadPreference.PRIMARY`.
+        '''
+        if tags is not None or max_staleness != -1:
+            if read_preference == ReadPreference.PRIMARY:
+                raise ValueError(
+                    'Can\'t read from the primary with tags or max_staleness, as they only select '
+                    'secondaries. Use another read preference, like PRIMARY_PREFERRED.'
+                )
+            read_preference = read_preference.__class__(tag_sets=tags, max_staleness=max_staleness)
+        return self._clone(_read_preference=read_preference)
+
+    def read_concern(self, level):
+        if not isinstance(level, ReadConcern):
+            level = ReadConcern(level)
+        return self._clone(_read_concern=level)
+
+    def write_concern(self, **kwargs):
+        '''
+        Writes the documents of this queryset with a `WriteConcern` built from the given
+        arguments (`w`, `wtimeout`, `j` and `fsync`).
+        '''
+        return self._clone(_write_concern=WriteConcern(**kwargs))
+
+    def raw_bson(self):
+        '''
+        Makes the driver return raw BSON documents to this queryset. Field values of the loaded
+        documents are then only decoded the first time they are accessed, which saves decoding
+        (and converting) the fields that are never read::
+
+            user = await User.objects.raw_bson().get(email='user@gmail.com')
+        '''
+        return self._clone(_raw_bson=True)
 
     def order_by(self, field_name, direction=ASCENDING):
         from motorengine.fields.base_field import BaseField
@@ -349,5 +754,127 @@ class BaseQuerySet(with_metaclass(ABCMeta)):
             )
 
         field = self.__klass__._fields[field_name]
-        self._order_fields.append((field.db_field, direction))
-        return self
+        return self._clone(_order_fields=self._order_fields + [(field.db_field, direction)])
+
+    def _get_page_sort(self):
+        # _id breaks ties between documents with the same values in the order by fields
+        sort = list(self._order_fields)
+        if not any(db_field == '_id' for db_field, direction in sort):
+            direction = sort[-1][1] if sort else ASCENDING
+            sort.append(('_id', direction))
+        return sort
+
+    def _get_loaded_fields_with_sort(self, sort):
+        # documents are compared by the values of the order by fields, so they are always loaded
+        loaded_fields = self._loaded_fields
+        if not loaded_fields:
+            return loaded_fields
+
+        names = set(
+            self.__klass__._fields_by_db_name[db_field].name
+            for db_field, direction in sort
+            if db_field != '_id'
+        )
+
+        loaded_fields = copy(loaded_fields)
+        if loaded_fields.value == QueryFieldList.EXCLUDE:
+            loaded_fields.fields -= names | set(['_id'])
+        elif set(loaded_fields.slice) != loaded_fields.fields:
+            # projections with just slices load all the fields
+            loaded_fields.fields |= names
+
+        if loaded_fields._id == QueryFieldList.EXCLUDE:
+            loaded_fields._id = None
+
+        return loaded_fields
+
+    def _get_page_key(self, document, sort):
+        key = []
+        for db_field, direction in sort:
+            if db_field == '_id':
+                key.append(document._id)
+            else:
+                field = self.__klass__._fields_by_db_name[db_field]
+                key.append(field.to_query(document.get_field_value(field.name)))
+        return key
+
+    @staticmethod
+    def _get_page_token(key):
+        return base64.urlsafe_b64encode(BSON.encode({'key': key})).decode('ascii')
+
+    @staticmethod
+    def _get_key_from_page_token(token, sort):
+        try:
+            key = BSON(base64.urlsafe_b64decode(token)).decode()['key']
+        except Exception:
+            raise ValueError('Invalid pagination token: %s' % token)
+
+        if not isinstance(key, list) or len(key) != len(sort):
+            raise ValueError('Invalid pagination token: %s' % token)
+
+        return key
+
+    @staticmethod
+    def _get_after_condition(db_field, direction, value):
+        # null values sort before any other value, but range operators never match them
+        if direction == DESCENDING:
+            if value is None:
+                return None
+            return {'$or': [{db_field: {'$lt': value}}, {db_field: None}]}
+
+        if value is None:
+            return {db_field: {'$ne': None}}
+        return {db_field: {'$gt': value}}
+
+    def _get_page_queryset(self, after, page_size):
+        from motorengine.base.document import BaseDocument
+
+        sort = self._get_page_sort()
+        queryset = self._clone(
+            _order_fields=sort, _limit=page_size + 1, _skip=None,
+            _loaded_fields=self._get_loaded_fields_with_sort(sort)
+        )
+
+        if after is None:
+            return queryset
+
+        if isinstance(after, BaseDocument):
+            key = self._get_page_key(after, sort)
+        elif isinstance(after, (list, tuple)):
+            key = list(after)
+        else:
+            key = self._get_key_from_page_token(after, sort)
+
+        # documents after the key are either past it in the first order by field, or equal to
+        # it in the first fields and past it in the next one
+        conditions = []
+        for index, (db_field, direction) in enumerate(sort):
+            after = self._get_after_condition(db_field, direction, key[index])
+            if after is None:
+                continue
+
+            condition = dict(
+                (sort[previous][0], key[previous])
+                for previous in range(index)
+            )
+            condition.update(after)
+            conditions.append(condition)
+
+        query = self._get_query()
+        page_query = {'$or': conditions}
+        if query:
+            page_query = {'$and': [query, page_query]}
+
+        # the filters are part of the page query already
+        return queryset._clone(_bound_query=page_query, _filters=None)
+
+    def _get_page(self, documents, page_size):
+        next_token = None
+        if len(documents) > page_size:
+            documents = documents[:page_size]
+            next_token = self._get_page_token(self._get_page_key(documents[-1], self._get_page_sort()))
+
+        return EasyDict({
+            'documents': documents,
+            'next_token': next_token
+        })
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import struct
+from collections.abc import MutableMapping
+
+from bson import BSON
+from bson.errors import InvalidBSON
+
+from motorengine.base.changes import track_value
+
+
+_PACK_INT = struct.Struct('<i').pack
+_UNPACK_INT = struct.Struct('<i').unpack_from
+
+# size of the value of the BSON types with a fixed size
+_FIXED_SIZES = {
+    0x01: 8,   # double
+    0x06: 0,   # undefined
+    0x07: 12,  # object id
+    0x08: 1,   # boolean
+    0x09: 8,   # datetime
+    0x0A: 0,   # null
+    0x10: 4,   # int32
+    0x11: 8,   # timestamp
+    0x12: 8,   # int64
+    0x13: 16,  # decimal128
+    0x7F: 0,   # max key
+    0xFF: 0,   # min key
+}
+
+# types whose value starts with the int32 size of what follows it
+_STRING_TYPES = (0x02, 0x0D, 0x0E)  # string, javascript code, symbol
+
+# types whose value starts with their own int32 size
+_DOCUMENT_TYPES = (0x03, 0x04, 0x0F)  # document, array, code with scope
+
+# marks values removed from a RawValues mapping
+_MISSING = object()
+
+
+class RawElements(object):
+    '''
+    Index of the top level elements of a raw BSON document.
+
+    The document is scanned only as far as needed to find the requested key, and each value is
+    decoded on its own (by the driver's C extension, if available) when asked for.
+    '''
+
+    __slots__ = ('data', 'codec_options', '_position', '_offsets')
+
+    def __init__(self, data, codec_options):
+        self.data = data
+        self.codec_options = codec_options
+        self._position = 4
+        self._offsets = {}
+
+    @property
+    def is_scanned(self):
+        return self._position >= len(self.data) - 1
+
+    def _scan(self, key=None):
+        data = self.data
+        end = len(data) - 1
+        offsets = self._offsets
+        position = self._position
+        index = data.index
+
+        while position < end:
+            start = position
+            element_type = data[position]
+            name_end = index(b'\x00', position + 1)
+            name = data[position + 1:name_end]
+            position = name_end + 1
+
+            size = _FIXED_SIZES.get(element_type)
+            if size is None:
+                if element_type in _STRING_TYPES:
+                    size = 4 + _UNPACK_INT(data, position)[0]
+                elif element_type in _DOCUMENT_TYPES:
+                    size = _UNPACK_INT(data, position)[0]
+                elif element_type == 0x05:  # binary
+                    size = 5 + _UNPACK_INT(data, position)[0]
+                elif element_type == 0x0B:  # regular expression
+                    size = index(b'\x00', index(b'\x00', position) + 1) + 1 - position
+                elif element_type == 0x0C:  # db pointer
+                    size = 16 + _UNPACK_INT(data, position)[0]
+                else:
+                    raise InvalidBSON("Unknown BSON type %r for element '%s'." % (
+                        element_type, name.decode('utf-8')
+                    ))
+
+            position += size
+            offsets[name] = (start, position)
+
+            if name == key:
+                break
+
+        if position > end:
+            raise InvalidBSON('Bad object or element length.')
+
+        self._position = position
+
+    def __contains__(self, key):
+        return self.find(key) is not None
+
+    def find(self, key):
+        # element names are kept encoded, so the scan never decodes them
+        key = key.encode('utf-8')
+        element = self._offsets.get(key)
+        if element is None and not self.is_scanned:
+            self._scan(key)
+            element = self._offsets.get(key)
+        return element
+
+    def keys(self):
+        if not self.is_scanned:
+            self._scan()
+        return [name.decode('utf-8') for name in self._offsets]
+
+    def get(self, key, default=None):
+        element = self.find(key)
+        if element is None:
+            return default
+
+        start, end = element
+        document = BSON(_PACK_INT(end - start + 5) + self.data[start:end] + b'\x00')
+        return document.decode(self.codec_options)[key]
+
+    def to_dict(self):
+        return BSON(self.data).decode(self.codec_options)
+
+
+class RawValues(MutableMapping):
+    '''
+    Values of a document loaded in raw BSON mode (see `QuerySet.raw_bson`).
+
+    Field values are decoded from the raw document (and converted by their field's `from_son`)
+    the first time they are accessed. Dynamic fields are only discovered when the whole document
+    is needed (in `to_son`, for instance) or an unknown attribute is accessed.
+    '''
+
+    __slots__ = ('_document', '_elements', '_values', '_dynamic_keys')
+
+    def __init__(self, document, elements):
+        self._document = document
+        self._elements = elements
+        self._values = {}
+        self._dynamic_keys = None
+
+    def load_dynamic_fields(self):
+        from motorengine.fields.dynamic_field import DynamicField
+
+        if self._dynamic_keys is not None:
+            return self._dynamic_keys
+
+        document = self._document
+        self._dynamic_keys = {}
+
+        for key in self._elements.keys():
+            if key in ('_id', '_cls') or document.get_field_by_db_name(key) is not None:
+                continue
+
+            # dynamic fields are stored with a leading underscore
+            name = key.lstrip('_')
+            self._dynamic_keys[name] = key
+            if document._get_field(name) is None:
+                document._add_dynamic_field(name, DynamicField(db_field="_%s" % name))
+
+        return self._dynamic_keys
+
+    def _decode(self, name):
+        field = self._document._fields.get(name)
+
+        if field is None:
+            key = self.load_dynamic_fields().get(name)
+            if key is None:
+                return _MISSING
+            return self._elements.get(key)
+
+        elements = self._elements
+        for key in (field.db_field, '_%s' % field.db_field):
+            if elements.find(key) is not None:
+                return field.from_son(elements.get(key))
+
+        if callable(field.default):
+            return field.default()
+        return field.default
+
+    def __getitem__(self, name):
+        values = self._values
+
+        value = values.get(name, _MISSING)
+        if value is _MISSING and name not in values:
+            value = self._decode(name)
+            if value is not _MISSING and self._document._changed_fields is not None:
+                value = track_value(self._document._fields.get(name), value)
+            values[name] = value
+
+        if value is _MISSING:
+            raise KeyError(name)
+
+        return value
+
+    def __setitem__(self, name, value):
+        self._values[name] = value
+
+    def decoded_items(self):
+        return [(name, value) for name, value in self._values.items() if value is not _MISSING]
+
+    def __delitem__(self, name):
+        self[name]
+        self._values[name] = _MISSING
+
+    def __iter__(self):
+        self.load_dynamic_fields()
+
+        names = list(self._document._fields)
+        if self._document._dynamic_fields:
+            names.extend(self._document._dynamic_fields)
+        for name in list(self._values):
+            if name not in names:
+                names.append(name)
+
+        for name in names:
+            if name in self:
+                yield name
+
+    def __len__(self):
+        return sum(1 for name in self)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import zlib
+
+
+class BaseRouter(object):
+    '''
+    Chooses the connection alias of the documents of a class that has it as its `__router__`,
+    instead of always using its `__alias__`. `aliases` are all the aliases the documents of the
+    class can be in.
+
+    Routers return None when the alias of a document or query can't be told, in which case
+    `find_all` and `count` query all the aliases and other operations raise
+    `UnroutableQueryError`.
+    '''
+
+    def __init__(self, aliases):
+        self.aliases = list(aliases)
+
+        if not self.aliases:
+            raise ValueError('A router needs at least one alias.')
+
+    def route_document(self, document):
+        return None
+
+    def route_query(self, document_class, query):
+        return None
+
+
+class HashRouter(BaseRouter):
+    '''
+    Spreads the documents of a class across `aliases` by the hash of the value of their `key`
+    field, so all the documents with the same value (of a tenant, for instance) are in the same
+    alias::
+
+        class Order(Document):
+            __router__ = HashRouter('tenant_id', ['orders-1', 'orders-2'])
+
+            tenant_id = StringField(required=True)
+
+    Queries are routed when they filter the key by a value (or by values in the same alias).
+    '''
+
+    def __init__(self, key, aliases):
+        super(HashRouter, self).__init__(aliases)
+        self.key = key
+
+    def get_alias(self, value):
+        # crc32 is used instead of hash, as it's the same in every process
+        digest = zlib.crc32(str(value).encode('utf-8'))
+        return self.aliases[digest % len(self.aliases)]
+
+    def route_document(self, document):
+        field = document._fields.get(self.key)
+        value = document.get_field_value(self.key)
+        if field is not None:
+            value = field.to_query(value)
+
+        if value is None:
+            return None
+        return self.get_alias(value)
+
+    def _get_values(self, query, db_field):
+        if db_field in query:
+            value = query[db_field]
+            if not isinstance(value, dict):
+                return [value]
+            if list(value.keys()) == ['$in']:
+                return value['$in']
+            return None
+
+        for condition in query.get('$and', []):
+            values = self._get_values(condition, db_field)
+            if values is not None:
+                return values
+
+        return None
+
+    def route_query(self, document_class, query):
+        field = document_class._fields.get(self.key)
+        db_field = field.db_field if field is not None else self.key
+
+        values = self._get_values(query, db_field)
+        if not values:
+            return None
+
+        aliases = set(self.get_alias(value) for value in values)
+        if len(aliases) > 1:
+            return None
+        return aliases.pop()
@@ -20,6 +20,22 @@ class PartlyLoadedDocumentError(ValueError):
     pass
 
 
+class UnroutableQueryError(RuntimeError):
+    pass
+
+
+class BulkInsertError(ValueError):
+    '''
+    Raised by `bulk_insert` for an invalid document. Documents are validated one chunk at a
+    time, so the chunks before it may have been inserted already: `inserted` tells how many
+    documents were.
+    '''
+
+    def __init__(self, message, inserted):
+        super(BulkInsertError, self).__init__(message)
+        self.inserted = inserted
+
+
 # E11000 duplicate key error index: test.UniqueFieldDocument.$name_1  dup key: { : "test" }
 PYMONGO_ERROR_REGEX = re.compile(r"(?P<error_code>.+?)\s(?P<error_type>.+?):\s*(?P<index_name>.+?)\s+(?P<error>.+?)")
 
@@ -27,6 +27,16 @@ class QueryFieldList(object):
         self._only_called = _only_called
         self.slice = {}
 
+    def __copy__(self):
+        # __add__ changes the field list in place, so copies don't share any of its sets
+        field_list = QueryFieldList(
+            self.fields, value=self.value, always_include=self.always_include,
+            _only_called=self._only_called
+        )
+        field_list._id = self._id
+        field_list.slice = dict(self.slice)
+        return field_list
+
     def __add__(self, f):
         if isinstance(f.value, dict):
             for field in f.fields:
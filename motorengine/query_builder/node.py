@@ -1,11 +1,21 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import copy
-
 # Adapted from https://github.com/MongoEngine/mongoengine/blob/master/mongoengine/queryset/visitor.py
 
-from motorengine.query_builder.transform import transform_query
+from motorengine.query_builder.transform import (  # NOQA
+    transform_query, compile_query, execute_query, prepare_query, Param
+)
+
+
+# maximum number of compiled query plans kept by QNode.to_query, the cache is cleared when full
+QUERY_PLAN_CACHE_SIZE = 1000
+
+_query_plans = {}
+
+
+def clear_query_plans():
+    _query_plans.clear()
 
 
 class QNodeVisitor(object):
@@ -58,7 +68,8 @@ class SimplificationVisitor(QNodeVisitor):
                 raise DuplicateQueryConditionsError()
 
             query_ops.update(ops)
-            combined_query.update(copy.deepcopy(query))
+            # the values are only read when compiling, so they can be shared with the queries
+            combined_query.update(query)
         return combined_query
 
 
@@ -81,6 +92,85 @@ class QueryCompilerVisitor(QNodeVisitor):
         return transform_query(self.document, **query.query)
 
 
+class QueryPlan(object):
+    """Compiled query of a Q node: the fields and operators of its keys are resolved once,
+    so executing the plan only converts the values of the node.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def execute(self, node, params=None):
+        return execute_query(self.steps, node.query, params)
+
+    def prepare(self, node):
+        steps, query = prepare_query(self.steps, node.query)
+        return QueryPlan(steps), Q(**query)
+
+
+class MergedQueryPlan(QueryPlan):
+    """Compiled query of an 'and' combination of Q nodes that can be merged into a single query.
+    """
+
+    def _merge(self, node):
+        query = {}
+        for child in node.children:
+            query.update(child.query)
+        return query
+
+    def execute(self, node, params=None):
+        return execute_query(self.steps, self._merge(node), params)
+
+    def prepare(self, node):
+        return QueryPlan(self.steps).prepare(Q(**self._merge(node)))
+
+
+class CombinationPlan(object):
+    def __init__(self, operator, children):
+        self.operator = operator
+        self.children = children
+
+    def execute(self, node, params=None):
+        return {
+            self.operator: [
+                plan.execute(child, params)
+                for plan, child in zip(self.children, node.children)
+            ]
+        }
+
+    def prepare(self, node):
+        plans = []
+        prepared_node = QCombination(node.operation, [])
+        for plan, child in zip(self.children, node.children):
+            plan, child = plan.prepare(child)
+            plans.append(plan)
+            prepared_node.children.append(child)
+        return CombinationPlan(self.operator, plans), prepared_node
+
+
+class NotPlan(object):
+    def __init__(self, plan):
+        self.plan = plan
+
+    def execute(self, node, params=None):
+        return QNot.negate(self.plan.execute(node.query, params))
+
+    def prepare(self, node):
+        plan, query = self.plan.prepare(node.query)
+        return NotPlan(plan), QNot(query)
+
+
+class LiteralPlan(object):
+    """Plan for already compiled query dicts found in a query tree.
+    """
+
+    def execute(self, node, params=None):
+        return node
+
+    def prepare(self, node):
+        return self, node
+
+
 class QNode(object):
     """Base class for nodes in query trees.
     """
@@ -89,9 +179,25 @@ class QNode(object):
     OR = 1
 
     def to_query(self, document):
-        query = self.accept(SimplificationVisitor(), document)
-        query = query.accept(QueryCompilerVisitor(document), document)
-        return query
+        # the plan only depends on the document and the shape of the tree (not on its values),
+        # so each shape is compiled once and then just executed with the values of the nodes
+        key = (document, self.shape)
+        plan = _query_plans.get(key)
+
+        if plan is None:
+            plan = self.compile(document)
+            if len(_query_plans) >= QUERY_PLAN_CACHE_SIZE:
+                _query_plans.clear()
+            _query_plans[key] = plan
+
+        return plan.execute(self)
+
+    @property
+    def shape(self):
+        raise NotImplementedError
+
+    def compile(self, document):
+        raise NotImplementedError
 
     def accept(self, visitor, document):
         raise NotImplementedError
@@ -137,12 +243,37 @@ class QCombination(QNode):
             else:
                 self.children.append(node)
 
+    @property
+    def shape(self):
+        return (self.operation, tuple(
+            node.shape if isinstance(node, QNode) else None
+            for node in self.children
+        ))
+
+    def compile(self, document):
+        if self.operation == self.AND and all(isinstance(node, Q) for node in self.children):
+            keys = [key for node in self.children for key in node.query]
+            # the same condition can't be merged twice into the same query
+            if len(keys) == len(set(keys)):
+                return MergedQueryPlan(compile_query(document, keys))
+
+        operator = "$and"
+        if self.operation == self.OR:
+            operator = "$or"
+
+        return CombinationPlan(operator, [
+            node.compile(document) if isinstance(node, QNode) else LiteralPlan()
+            for node in self.children
+        ])
+
     def accept(self, visitor, document):
-        for i in range(len(self.children)):
-            if isinstance(self.children[i], QNode):
-                self.children[i] = self.children[i].accept(visitor, document)
+        # visitors get a new combination, so the same tree can be compiled any number of times
+        children = [
+            node.accept(visitor, document) if isinstance(node, QNode) else node
+            for node in self.children
+        ]
 
-        return visitor.visit_combination(self)
+        return visitor.visit_combination(QCombination(self.operation, children))
 
     @property
     def empty(self):
@@ -192,6 +323,13 @@ class Q(QNode):
         else:
             self.query = query
 
+    @property
+    def shape(self):
+        return tuple(sorted(self.query))
+
+    def compile(self, document):
+        return QueryPlan(compile_query(document, self.query))
+
     def accept(self, visitor, document):
         return visitor.visit_query(self)
 
@@ -204,11 +342,18 @@ class QNot(QNode):
     def __init__(self, query):
         self.query = query
 
+    @property
+    def shape(self):
+        return ('not', self.query.shape)
+
+    def compile(self, document):
+        return NotPlan(self.query.compile(document))
+
     def accept(self, visitor, document):
-        return self.to_query(document)
+        return self.negate(self.query.to_query(document))
 
-    def to_query(self, document):
-        query = self.query.to_query(document)
+    @staticmethod
+    def negate(query):
         result = {}
         for key, value in query.items():
             if isinstance(value, (dict, )):
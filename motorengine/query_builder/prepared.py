@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from motorengine.query_builder.node import Q, QCombination, QNot, Param
+
+
+class PreparedQuery(object):
+    '''
+    Query whose filters are validated and compiled once, with `Param` placeholders for the values
+    given when it is executed. Values that are not parameters are converted when preparing the
+    query as well, so executing it only converts the parameter values::
+
+        find_user = User.objects.prepare(email=Param('email'), active=True)
+
+        user = await find_user.get(email='heynemann@gmail.com')
+        users = await find_user.find_all(email='heynemann@gmail.com', lazy=False)
+
+    Any other argument (`alias`, `lazy` or `callback`) is passed to the queryset method.
+    '''
+
+    QUERYSET_ARGUMENTS = ('alias', 'lazy', 'callback')
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.plan = None
+        self.filters = None
+        self.params = set()
+
+        if queryset._filters:
+            plan = queryset._filters.compile(queryset.__klass__)
+            self.plan, self.filters = plan.prepare(queryset._filters)
+            self.params = self.get_params(self.filters)
+
+    @classmethod
+    def get_params(cls, node):
+        if isinstance(node, Q):
+            return set(
+                value.name for value in node.query.values()
+                if isinstance(value, Param)
+            )
+
+        if isinstance(node, QNot):
+            return cls.get_params(node.query)
+
+        params = set()
+        if isinstance(node, QCombination):
+            for child in node.children:
+                params.update(cls.get_params(child))
+        return params
+
+    def bind(self, **params):
+        '''
+        Returns a queryset filtered by this query with the given parameter values. Filters added
+        to it later are combined with the bound query.
+        '''
+        if self.plan is None:
+            return self.queryset
+        # the filters of the queryset were compiled into the plan
+        return self.queryset._clone(
+            _bound_query=self.plan.execute(self.filters, params), _filters=None
+        )
+
+    def _split_arguments(self, kwargs):
+        params = {}
+        arguments = {}
+
+        for name, value in kwargs.items():
+            if name in self.params:
+                params[name] = value
+            elif name in self.QUERYSET_ARGUMENTS:
+                arguments[name] = value
+            else:
+                raise ValueError("Unknown query parameter '%s'." % name)
+
+        return params, arguments
+
+    def get(self, *arguments, **kwargs):
+        params, kwargs = self._split_arguments(kwargs)
+        return self.bind(**params).get(*arguments, **kwargs)
+
+    def find_all(self, *arguments, **kwargs):
+        params, kwargs = self._split_arguments(kwargs)
+        return self.bind(**params).find_all(*arguments, **kwargs)
+
+    def count(self, *arguments, **kwargs):
+        params, kwargs = self._split_arguments(kwargs)
+        return self.bind(**params).count(*arguments, **kwargs)
@@ -44,6 +44,35 @@ OPERATORS = {
     'istartswith': IStartsWithOperator,
 }
 
+# update keys are prefixed with the name of their operator (`inc__views=1`)
+UPDATE_OPERATORS = {
+    'set': '$set',
+    'unset': '$unset',
+    'inc': '$inc',
+    'push': '$push',
+    'add_to_set': '$addToSet',
+    'pull': '$pull',
+    'max': '$max',
+    'min': '$min',
+}
+
+
+class Param(object):
+    """Placeholder for a value only given when a prepared query is executed
+    (see `QuerySet.prepare`).
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def bind(self, params):
+        if params is None or self.name not in params:
+            raise ValueError("No value given for the query parameter '%s'." % self.name)
+        return params[self.name]
+
+    def __repr__(self):
+        return "Param(%r)" % self.name
+
 
 class DefaultOperator(QueryOperator):
     def to_query(self, field_name, value):
@@ -63,19 +92,21 @@ def update(d, u):
     return d
 
 
-def transform_query(document, **query):
-    mongo_query = {}
+def compile_query(document, keys):
+    """Resolves the fields and operators of the given query keys, returning the steps
+    `execute_query` uses to build a query with any values for those keys.
+    """
+    steps = []
 
-    for key, value in sorted(query.items()):
+    for key in sorted(keys):
         if key == 'raw':
-            update(mongo_query, value)
+            steps.append((key, None, None, None))
             continue
 
         if '__' not in key:
             field = document.get_fields(key)[0]
             field_name = field.db_field
             operator = DefaultOperator()
-            field_value = operator.get_value(field, value)
         else:
             values = key.split('__')
             field_reference_name, operator = ".".join(values[:-1]), values[-1]
@@ -90,13 +121,138 @@ def transform_query(document, **query):
                 for field in fields
             ])
             operator = OPERATORS.get(operator, DefaultOperator)()
-            field_value = operator.get_value(fields[-1], value)
+            field = fields[-1]
+
+        steps.append((key, field_name, operator, field))
+
+    return steps
 
+
+def execute_query(steps, query, params=None):
+    mongo_query = {}
+
+    for key, field_name, operator, field in steps:
+        value = query[key]
+        if value.__class__ is Param:
+            value = value.bind(params)
+
+        if operator is None:
+            update(mongo_query, value)
+            continue
+
+        field_value = operator.get_value(field, value)
         update(mongo_query, operator.to_query(field_name, field_value))
 
     return mongo_query
 
 
+def prepare_query(steps, query):
+    """Converts the values of the query that are not parameters, returning the steps and query
+    `execute_query` uses to build the query with just the parameter values left to convert.
+    """
+    prepared_steps = []
+    prepared_query = {}
+
+    for step in steps:
+        key, field_name, operator, field = step
+        value = query[key]
+
+        if operator is None or value.__class__ is Param:
+            prepared_steps.append(step)
+            prepared_query[key] = value
+        else:
+            # already converted values are merged into the query just like raw queries
+            prepared_steps.append((key, None, None, None))
+            prepared_query[key] = operator.to_query(field_name, operator.get_value(field, value))
+
+    return prepared_steps, prepared_query
+
+
+def transform_query(document, **query):
+    return execute_query(compile_query(document, query), query)
+
+
+def _value_to_son(field, value):
+    from motorengine.fields.embedded_document_field import EmbeddedDocumentField
+    from motorengine.fields.list_field import ListField
+
+    # embedded documents can be given as the dicts they are stored as
+    if isinstance(field, EmbeddedDocumentField) and isinstance(value, dict):
+        return value
+    if isinstance(field, ListField) and isinstance(value, (list, tuple)):
+        return [_value_to_son(field._base_field, item) for item in value]
+    return field.to_son(value)
+
+
+def _item_to_son(field, value):
+    # list operators work on the items of the list, so they are converted by the item field
+    base_field = getattr(field, '_base_field', None)
+    if base_field is not None:
+        field = base_field
+
+    if isinstance(value, (list, tuple)):
+        return [_value_to_son(field, item) for item in value]
+    return _value_to_son(field, value)
+
+
+def transform_update(document, definition):
+    """Compiles the keys of an update definition into MongoDB update operators. Keys are either
+    fields, names prefixed by an update operator (`inc__views`, `push__tags`, `set__author__name`)
+    or update operators (`$set`) whose value is used as is. Fields and names without an operator
+    are set just like `set__<name>`.
+    """
+    from motorengine.fields.base_field import BaseField
+
+    mongo_update = {}
+
+    for key, value in definition.items():
+        if isinstance(key, BaseField):
+            operator, fields = 'set', [key]
+        elif key.startswith('$'):
+            mongo_update.setdefault(key, {}).update(value)
+            continue
+        else:
+            operator, name = 'set', key
+            for operator_name in UPDATE_OPERATORS:
+                if key.startswith(operator_name + '__'):
+                    operator, name = operator_name, key[len(operator_name) + 2:]
+                    break
+
+            path = name.replace('__', '.')
+            # fields named by their db_field are still accepted, as definitions used to be sent as given
+            head = path.split('.', 1)[0]
+            if head not in document._fields and head in document._fields_by_db_name:
+                path = document._fields_by_db_name[head].name + path[len(head):]
+
+            fields = document.get_fields(path)
+
+        field_name = ".".join([
+            hasattr(field, 'db_field') and field.db_field or field
+            for field in fields
+        ])
+        field = fields[-1]
+
+        if operator == 'unset':
+            value = ''
+        elif not isinstance(field, BaseField):
+            # values of positions in lists are used as they are
+            pass
+        elif operator in ('push', 'add_to_set'):
+            value = _item_to_son(field, value)
+            if isinstance(value, list):
+                value = {'$each': value}
+        elif operator == 'pull':
+            value = _item_to_son(field, value)
+            if isinstance(value, list):
+                value = {'$in': value}
+        elif operator != 'inc':
+            value = _value_to_son(field, value)
+
+        mongo_update.setdefault(UPDATE_OPERATORS[operator], {})[field_name] = value
+
+    return mongo_update
+
+
 def validate_fields(document, query):
     from motorengine.fields.embedded_document_field import EmbeddedDocumentField
     from motorengine.fields.list_field import ListField
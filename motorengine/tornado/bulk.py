@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+from pymongo.errors import BulkWriteError
+
+from motorengine.base.bulk import BaseBulk
+
+
+class Bulk(BaseBulk):
+    def handle_bulk_write(self, chunks, indexes, operations, callback):
+        def handle(*arguments, **kw):
+            if len(arguments) > 1 and arguments[1]:
+                if not isinstance(arguments[1], BulkWriteError):
+                    raise arguments[1]
+                api_result = arguments[1].details
+            else:
+                api_result = arguments[0].bulk_api_result
+
+            if self._add_result(indexes, operations, api_result):
+                self._execute_chunk(chunks, callback)
+            else:
+                callback(self.result)
+
+        return handle
+
+    def _execute_chunk(self, chunks, callback):
+        chunk = next(chunks, None)
+        if chunk is None:
+            callback(self.result)
+            return
+
+        alias, indexes, operations = chunk
+
+        def handle(*arguments, **kw):
+            self.queryset.coll(alias).bulk_write(
+                self._get_requests(operations), ordered=self.ordered,
+                callback=self.handle_bulk_write(chunks, indexes, operations, callback)
+            )
+
+        if self.queryset.is_index_ensured(alias=alias):
+            handle()
+        else:
+            self.queryset.ensure_index(callback=handle, alias=alias)
+
+    def execute(self, callback):
+        self._execute_chunk(self._start(), callback)
@@ -6,6 +6,8 @@ import six
 
 from motor import MotorClient
 from motorengine.tornado.database import Database
+from motorengine.base import indexes_registry
+from motorengine.base.pool import get_client_settings, get_pool_stats as get_client_pool_stats
 from motorengine.errors import MotorengineConnectionError
 
 
@@ -14,6 +16,8 @@ DEFAULT_CONNECTION_NAME = 'default'
 _connection_settings = {}
 _connections = {}
 _default_dbs = {}
+# Database wrappers by (alias, db), so looking up a connection is a single dict access
+_databases = {}
 
 
 def register_connection(db, alias, **kwargs):
@@ -28,10 +32,13 @@ def cleanup():
     global _connections
     global _connection_settings
     global _default_dbs
+    global _databases
 
     _connections = {}
     _connection_settings = {}
     _default_dbs = {}
+    _databases = {}
+    indexes_registry.clear()
 
 
 def disconnect(alias=DEFAULT_CONNECTION_NAME):
@@ -45,15 +52,32 @@ def disconnect(alias=DEFAULT_CONNECTION_NAME):
         del _connection_settings[alias]
         del _default_dbs[alias]
 
+        for database_alias, db in list(_databases):
+            if database_alias == alias:
+                del _databases[database_alias, db]
+
+        for index_alias, document_class in list(indexes_registry):
+            if index_alias == alias or (index_alias is None and alias == DEFAULT_CONNECTION_NAME):
+                indexes_registry.discard((index_alias, document_class))
+
 
 def get_connection(alias=DEFAULT_CONNECTION_NAME, db=None):
     global _connections
     global _default_dbs
 
+    # the default database of the alias is part of the key, so it has a single wrapper
+    db = db or _default_dbs.get(alias)
+    key = (alias, db)
+    database = _databases.get(key)
+    if database is not None:
+        return database
+
     if alias not in _connections:
         conn_settings = _connection_settings[alias].copy()
-        db = conn_settings.pop('name', None)
+        conn_settings.pop('name', None)
+        conn_settings = get_client_settings(conn_settings)
 
+        # the client connects in the background, operations wait for it without blocking the loop
         connection_class = MotorClient
         try:
             _connections[alias] = connection_class(**conn_settings)
@@ -62,22 +86,93 @@ def get_connection(alias=DEFAULT_CONNECTION_NAME, db=None):
             err = MotorengineConnectionError('Cannot connect to database {} :\n{}'.format(alias, exc_info[1]))
             raise six.reraise(MotorengineConnectionError, err, exc_info[2])
 
-    try:
-        if not _connections[alias].connected:
-            _connections[alias].open_sync()
-    except Exception:
-        exc_info = sys.exc_info()
-        err = MotorengineConnectionError('Cannot connect to database {} :\n{}'.format(alias, exc_info[1]))
-        raise six.reraise(MotorengineConnectionError, err, exc_info[2])
-
-    database = getattr(_connections[alias], db or _default_dbs[alias])
-    return Database(_connections[alias], database)
+    database = getattr(_connections[alias], db)
+    _databases[key] = Database(_connections[alias], database)
+    return _databases[key]
 
 
 def connect(db, alias=DEFAULT_CONNECTION_NAME, **kwargs):
+    '''
+    Registers the connection to the given database with the given alias and returns it. Other
+    arguments are passed to the client, and its connection pool can be set up with
+    `max_pool_size`, `min_pool_size`, `max_idle_time_ms` and `wait_queue_timeout_ms`::
+
+        connect("test", host="localhost", port=27017, max_pool_size=50, min_pool_size=10)
+    '''
     global _connections
     if alias not in _connections:
         kwargs['name'] = db
         register_connection(db, alias, **kwargs)
 
     return get_connection(alias, db=db)
+
+
+def ensure_connected(callback, alias=DEFAULT_CONNECTION_NAME):
+    '''
+    Calls back with the database of the given alias once its client reaches the server, without
+    blocking the IOLoop. If it can't connect, calls back with None and a
+    `MotorengineConnectionError` as second argument.
+    '''
+    database = get_connection(alias=alias)
+
+    def handle(*arguments, **kw):
+        # errors raised in the callback of the ping would never reach the caller
+        if len(arguments) > 1 and arguments[1]:
+            callback(None, MotorengineConnectionError(
+                'Cannot connect to database {} :\n{}'.format(alias, arguments[1])
+            ))
+            return
+
+        callback(database)
+
+    database.ping(callback=handle)
+
+
+def connect_async(db, callback, alias=DEFAULT_CONNECTION_NAME, **kwargs):
+    '''
+    Same as `connect`, but calls back once the connection is established, or with None and a
+    `MotorengineConnectionError` if it can't be (see `ensure_connected`).
+    '''
+    connect(db, alias=alias, **kwargs)
+    ensure_connected(callback, alias=alias)
+
+
+def get_pool_stats(alias=DEFAULT_CONNECTION_NAME):
+    '''
+    Returns the state of the connection pool of the given alias: its size settings, how many
+    connections are `checked_out` and `available`, in total and by server.
+    '''
+    get_connection(alias=alias)
+    settings = get_client_settings(_connection_settings[alias])
+    return get_client_pool_stats(_connections[alias], settings)
+
+
+def warm_up(callback, alias=DEFAULT_CONNECTION_NAME, connections=1):
+    '''
+    Opens up to `connections` connections in the pool of the given alias before it takes
+    traffic, by running as many pings at once. Once all the pings returned, calls back with
+    the stats of the pool (see `get_pool_stats`), or with None and a
+    `MotorengineConnectionError` as second argument if any of them failed.
+    '''
+    database = get_connection(alias=alias)
+    pings = max(connections, 1)
+    state = {'returned': 0, 'error': None}
+
+    def handle_ping(*arguments, **kw):
+        state['returned'] += 1
+        if len(arguments) > 1 and arguments[1] and state['error'] is None:
+            state['error'] = MotorengineConnectionError(
+                'Cannot connect to database {} :\n{}'.format(alias, arguments[1])
+            )
+
+        # errors raised in the callbacks of the pings would never reach the caller
+        if state['returned'] < pings:
+            return
+
+        if state['error'] is not None:
+            callback(None, state['error'])
+        else:
+            callback(get_pool_stats(alias=alias))
+
+    for index in range(pings):
+        database.ping(callback=handle_ping)
@@ -3,6 +3,8 @@ from motorengine.tornado.metaclasses import DocumentMetaClass
 
 
 class Document(BaseDocument, metaclass=DocumentMetaClass):
+    __slots__ = ()
+
     @classmethod
     async def ensure_index(cls, callback=None):
         await cls.objects.ensure_index(callback=callback)
@@ -45,8 +47,8 @@ class Document(BaseDocument, metaclass=DocumentMetaClass):
             })
             return
 
-        for dereference_function, document_id, values_collection, field_name, fill_values_method in references:
-            await dereference_function(
+        for load_queryset, document_id, values_collection, field_name, fill_values_method in references:
+            await load_queryset.get(
                 document_id,
                 callback=self.handle_load_reference(
                     callback=callback,
@@ -1,11 +1,11 @@
 # -*- coding: utf-8 -*-
 
 from easydict import EasyDict
-from bson.objectid import ObjectId
+from pymongo import ReturnDocument
 from pymongo.errors import DuplicateKeyError
+from tornado.concurrent import Future
 
-
-from motorengine.errors import UniqueKeyViolationError
+from motorengine.errors import BulkInsertError, UniqueKeyViolationError
 from motorengine.errors import PartlyLoadedDocumentError
 from motorengine.base.queryset import BaseQuerySet
 
@@ -40,6 +40,7 @@ class QuerySet(BaseQuerySet):
                 else:
                     raise arguments[1]
 
+            document._clear_changes()
             callback(document)
 
         return handle
@@ -55,21 +56,31 @@ class QuerySet(BaseQuerySet):
                 msg.format(document.__class__.__name__)
             )
 
+        alias = self._route_document(document, alias)
         self.update_field_on_save_values(document, document._id is not None)
         if self.validate_document(document):
-            self.ensure_index(
-                callback=self.indexes_saved_before_save(document, callback, alias=alias, upsert=upsert), 
-                alias=alias
-            )
+            handle = self.indexes_saved_before_save(document, callback, alias=alias, upsert=upsert)
+            if self.is_index_ensured(alias=alias):
+                handle()
+            else:
+                self.ensure_index(callback=handle, alias=alias)
 
     def indexes_saved_before_save(self, document, callback, alias=None, upsert=False):
         def handle(*args, **kw):
             doc = document.to_son()
 
             if document._id is not None:
+                # upserts replace the whole document, as it may not exist yet
+                update = None if upsert else document.get_changes(doc)
+                if update is None:
+                    update = doc
+                elif not update:
+                    callback(document)
+                    return
+
                 self.coll(alias).update(
-                    {'_id': document._id}, 
-                    doc, 
+                    {'_id': document._id},
+                    update,
                     callback=self.handle_update(document, callback),
                     upsert=upsert,
                 )
@@ -82,7 +93,8 @@ class QuerySet(BaseQuerySet):
     def handle_bulk_insert(documents, callback):
         def handle(*arguments, **kw):
             if len(arguments) > 1 and arguments[1]:
-                raise arguments[1]
+                callback(None, arguments[1])
+                return
 
             for object_index, object_id in enumerate(arguments[0]):
                 documents[object_index]._id = object_id
@@ -90,35 +102,83 @@ class QuerySet(BaseQuerySet):
 
         return handle
 
-    async def bulk_insert(self, documents, callback=None, alias=None):
-        is_valid = True
-        docs_to_insert = []
+    async def bulk_insert(self, documents, callback=None, alias=None, chunk_size=None, max_in_flight=None):
+        '''
+        Inserts the documents of any iterable, validating, serializing and sending them
+        `chunk_size` documents at a time, with up to `max_in_flight` chunks being inserted at
+        once. The callback gets the documents when given a list or tuple of them and the number
+        of inserted documents otherwise.
+
+        An invalid document stops the insert once the chunks before it are inserted, with a
+        `BulkInsertError` telling how many documents were. It is raised when awaiting and given
+        to the callback as its second argument, as are the errors of the inserts.
+        '''
+        if max_in_flight is None:
+            max_in_flight = self.DEFAULT_INSERTS_IN_FLIGHT
+
+        chunks = (
+            routed_chunk
+            for chunk_documents, sons in self._get_insert_chunks(documents, chunk_size)
+            for routed_chunk in self._route_chunk(chunk_documents, sons, alias)
+        )
+        state = {'in_flight': 0, 'inserted': 0, 'finished': False, 'error': None}
+        inserted = Future()
+
+        def handle_chunk(chunk, error=None):
+            state['in_flight'] -= 1
+            if error is not None:
+                state['finished'] = True
+                state['error'] = state['error'] or error
+            else:
+                state['inserted'] += len(chunk)
+            insert_next()
+
+        def insert_next():
+            while not state['finished'] and state['in_flight'] < max_in_flight:
+                try:
+                    chunk = next(chunks, None)
+                except ValueError as error:
+                    # errors raised in the callbacks of the inserts would never reach the caller
+                    state['error'] = error
+                    chunk = None
+
+                if chunk is None:
+                    state['finished'] = True
+                    break
+
+                chunk_alias, chunk_documents, sons = chunk
+                state['in_flight'] += 1
+                self.coll(chunk_alias).insert(sons, callback=self.handle_bulk_insert(chunk_documents, handle_chunk))
+
+            # inserts can call back before insert_next returns, so the result is only set once
+            if not state['finished'] or state['in_flight'] or inserted.done():
+                return
 
-        for document_index, document in enumerate(documents):
-            self.update_field_on_save_values(
-                document, document._id is not None
-            )
-            try:
-                is_valid = is_valid and self.validate_document(document)
-            except Exception as e:
-                raise ValueError('Validation for document {} in the documents you are saving failed with: {}'.format(
-                    document_index,
-                    e
-                ))
-
-            if not is_valid:
+            error = state['error']
+            if isinstance(error, ValueError):
+                error = BulkInsertError(str(error), state['inserted'])
+
+            if error is not None:
+                inserted.set_exception(error)
+                if callback is not None:
+                    callback(None, error)
                 return
 
-            docs_to_insert.append(document.to_son())
+            result = documents if isinstance(documents, (list, tuple)) else state['inserted']
+            inserted.set_result(result)
+            if callback is not None:
+                callback(result)
 
-        if not is_valid:
-            return
+        insert_next()
+        return await inserted
 
-        await self.coll(alias).insert(docs_to_insert, callback=self.handle_bulk_insert(documents, callback))
+    def bulk(self, ordered=True, chunk_size=None, alias=None):
+        from motorengine.tornado.bulk import Bulk
+        return Bulk(self, ordered=ordered, chunk_size=chunk_size, alias=alias)
 
     @staticmethod
     def handle_update_documents(callback):
-        def handle(*arguments, **kwargs):
+        def handle(*arguments, **kw):
             if len(arguments) > 1 and arguments[1]:
                 raise arguments[1]
 
@@ -129,19 +189,18 @@ class QuerySet(BaseQuerySet):
 
         return handle
 
-    async def update(self, definition, callback=None, alias=None):
+    async def update(self, definition=None, callback=None, alias=None, **kwargs):
         if callback is None:
             raise RuntimeError("The callback argument is required")
 
-        definition = self.transform_definition(definition)
+        definition = self.transform_definition(dict(definition or {}, **kwargs))
 
-        update_filters = {}
-        if self._filters:
-            update_filters = self.get_query_from_filters(self._filters)
+        update_filters = self._get_query()
+        alias = self._route_query(update_filters, alias)
 
         update_arguments = dict(
             spec=update_filters,
-            document={'$set': definition},
+            document=definition,
             multi=True,
             callback=self.handle_update_documents(callback)
         )
@@ -163,10 +222,12 @@ class QuerySet(BaseQuerySet):
 
         if instance is not None:
             if hasattr(instance, '_id') and instance._id:
+                alias = self._route_document(instance, alias)
                 await self.coll(alias).remove(instance._id, callback=self.handle_remove(callback))
         else:
-            if self._filters:
-                remove_filters = self.get_query_from_filters(self._filters)
+            remove_filters = self._get_query()
+            alias = self._route_query(remove_filters, alias)
+            if remove_filters:
                 await self.coll(alias).remove(remove_filters, callback=self.handle_remove(callback))
             else:
                 await self.coll(alias).remove(callback=self.handle_remove(callback))
@@ -182,18 +243,14 @@ class QuerySet(BaseQuerySet):
 
         return handle
 
-    def handle_get(self, callback):
+    def handle_get(self, callback, codec_options=None):
         def handle(*args, **kw):
             instance = args[0]
 
             if instance is None:
                 callback(None)
             else:
-                doc = self._resolve_class(instance).from_son(
-                    instance,
-                    _is_partly_loaded=bool(self._loaded_fields),
-                    _reference_loaded_fields=self._reference_loaded_fields
-                )
+                doc = self._get_document(instance, codec_options)
 
                 if self.is_lazy:
                     callback(doc)
@@ -203,76 +260,106 @@ class QuerySet(BaseQuerySet):
         return handle
 
     async def get(self, _id=None, callback=None, alias=None, **kwargs):
-        from motorengine.query_builder.node import Q
+        filters = self._get_document_query(_id, **kwargs)
+
+        aliases = self._get_aliases(filters, alias)
+        if len(aliases) > 1:
+            # documents that can't be routed are looked for in all the aliases
+            results = {}
+            for document_alias in aliases:
+                await self.get(_id, callback=self.handle_alias_result(
+                    callback, aliases, results, document_alias, self._merge_found
+                ), alias=document_alias, **kwargs)
+            return
+        alias = aliases[0]
 
-        if _id is None and not kwargs:
-            raise RuntimeError('Either an id or a filter must be provided to get')
+        await self._get_read_coll(alias).find_one(
+            filters, projection=self._loaded_fields.to_query(self.__klass__),
+            callback=self.handle_get(callback, self._get_codec_options(alias)),
+            **self._get_cursor_options()
+        )
 
-        if _id is not None:
-            if not isinstance(_id, ObjectId):
-                _id = ObjectId(_id)
+    async def modify(self, update=None, callback=None, new=True, upsert=False, alias=None, **kwargs):
+        if callback is None:
+            raise RuntimeError("The callback argument is required")
 
-            filters = {
-                '_id': _id
-            }
-        else:
-            filters = Q(**kwargs)
-            filters = self.get_query_from_filters(filters)
+        alias = self._route_query(self._get_query(), alias)
+        await self._get_read_coll(alias).find_one_and_update(
+            self._get_query(), self.transform_definition(dict(update or {}, **kwargs)),
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER if new else ReturnDocument.BEFORE,
+            callback=self.handle_get(callback, self._get_codec_options(alias)),
+            **self._get_find_one_and_arguments()
+        )
 
-        await self.coll(alias).find_one(
-            filters, projection=self._loaded_fields.to_query(self.__klass__),
-            callback=self.handle_get(callback)
+    async def pop_one(self, callback, alias=None):
+        alias = self._route_query(self._get_query(), alias)
+        await self._get_read_coll(alias).find_one_and_delete(
+            self._get_query(),
+            callback=self.handle_get(callback, self._get_codec_options(alias)),
+            **self._get_find_one_and_arguments()
         )
 
-    def handle_find_all_auto_load_references(self, callback, results):
+    @staticmethod
+    def handle_find_all_auto_load_references(callback, results, loaded):
         def handle(*arguments, **kwargs):
-            self.current_count += 1
-            if self.current_count == self.result_size:
-                self.current_count = None
-                self.result_size = None
+            # the count of loaded documents is kept per call, as querysets can be shared
+            loaded.append(True)
+            if len(loaded) == len(results):
                 callback(results)
 
         return handle
 
-    def handle_find_all(self, callback, lazy=None):
+    def handle_find_all(self, callback, lazy=None, codec_options=None):
         def handle(*arguments, **kwargs):
             if arguments and len(arguments) > 1 and arguments[1]:
                 raise arguments[1]
 
             result = []
-            self.current_count = 0
-            self.result_size = len(arguments[0])
-
-            # if _loaded_fields is not empty then documents are partly loaded
-            is_partly_loaded = bool(self._loaded_fields)
+            loaded = []
 
             for doc in arguments[0]:
-                obj = self._resolve_class(doc).from_son(
-                    doc,
-                    # set projections for references (if any)
-                    _reference_loaded_fields=self._reference_loaded_fields,
-                    _is_partly_loaded=is_partly_loaded
-                )
-
-                result.append(obj)
+                result.append(self._get_document(doc, codec_options))
 
             if not result:
                 callback(result)
                 return
 
             for doc in result:
+                handle_loaded = self.handle_find_all_auto_load_references(callback, result, loaded)
                 if (lazy is not None and not lazy) or not doc.is_lazy:
-                    doc.load_references(
-                        doc._fields,
-                        callback=self.handle_find_all_auto_load_references(callback, result)
-                    )
+                    doc.load_references(doc._fields, callback=handle_loaded)
                 else:
-                    self.handle_find_all_auto_load_references(callback, result)()
+                    handle_loaded()
+
+        return handle
+
+    @staticmethod
+    def handle_alias_result(callback, aliases, results, alias, merge):
+        def handle(result):
+            # the callback gets the merged results once all the aliases returned theirs
+            results[alias] = result
+            if len(results) == len(aliases):
+                callback(merge([results[name] for name in aliases]))
 
         return handle
 
     async def find_all(self, callback, lazy=None, alias=None):
-        to_list_arguments = dict(callback=self.handle_find_all(callback, lazy=lazy))
+        aliases = self._get_aliases(self._get_query(), alias)
+        if len(aliases) > 1:
+            # each alias loads the documents up to the limit, which are then merged in order
+            queryset = self._get_alias_queryset()
+            results = {}
+            for document_alias in aliases:
+                await queryset.find_all(callback=self.handle_alias_result(
+                    callback, aliases, results, document_alias, self._merge_documents
+                ), lazy=lazy, alias=document_alias)
+            return
+        alias = aliases[0]
+
+        to_list_arguments = dict(callback=self.handle_find_all(
+            callback, lazy=lazy, codec_options=self._get_codec_options(alias)
+        ))
 
         if self._limit is not None:
             to_list_arguments['length'] = self._limit
@@ -283,6 +370,30 @@ class QuerySet(BaseQuerySet):
 
         await cursor.to_list(**to_list_arguments)
 
+    def handle_paginate_after(self, callback, page_size):
+        def handle(documents):
+            callback(self._get_page(documents, page_size))
+
+        return handle
+
+    async def paginate_after(self, callback, after=None, page_size=None, lazy=None, alias=None):
+        '''
+        Loads the page of documents that comes after `after` in the order of this queryset
+        (with `_id` breaking ties), using range conditions on the order by fields instead
+        of `skip`, so every page costs the same to load.
+
+        `after` is either the `next_token` of the previous page, the last document of that page
+        or the list of its order by values, and is `None` for the first page. The callback gets
+        the loaded `documents` and the `next_token` of the following page (`None` for the last one).
+        '''
+        if page_size is None:
+            page_size = self.DEFAULT_PAGE_SIZE
+
+        queryset = self._get_page_queryset(after, page_size)
+        await queryset.find_all(
+            callback=self.handle_paginate_after(callback, page_size), lazy=lazy, alias=alias
+        )
+
     @staticmethod
     def handle_count(callback):
         def handle(*arguments, **kwargs):
@@ -293,7 +404,16 @@ class QuerySet(BaseQuerySet):
         return handle
 
     async def count(self, callback, alias=None):
-        cursor = self._get_find_cursor(alias=alias)
+        aliases = self._get_aliases(self._get_query(), alias)
+        if len(aliases) > 1:
+            results = {}
+            for document_alias in aliases:
+                await self.count(callback=self.handle_alias_result(
+                    callback, aliases, results, document_alias, sum
+                ), alias=document_alias)
+            return
+
+        cursor = self._get_find_cursor(alias=aliases[0])
         await cursor.count(callback=self.handle_count(callback))
 
     @property
@@ -336,5 +456,7 @@ class QuerySet(BaseQuerySet):
                 ),
             )
 
+        self._register_index(alias=alias)
+
         if not fields_with_index:
             callback(0)
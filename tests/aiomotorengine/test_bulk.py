@@ -6,6 +6,7 @@ from preggy import expect
 from motorengine.aiomotorengine import (
     Document, StringField
 )
+from motorengine.errors import BulkInsertError
 from tests.aiomotorengine import AsyncTestCase, async_test
 
 
@@ -36,6 +37,34 @@ class TestBulkInsert(AsyncTestCase):
         for comment in comments:
             expect(comment._id).not_to_be_null()
 
+    @async_test
+    @asyncio.coroutine
+    def test_can_insert_documents_from_generator_in_chunks(self):
+        inserted = yield from Comment.objects.bulk_insert(
+            (Comment(text=str(number)) for number in range(25)),
+            chunk_size=10, max_in_flight=2
+        )
+
+        expect(inserted).to_equal(25)
+
+        count = yield from Comment.objects.count()
+        expect(count).to_equal(25)
+
+    @async_test
+    async def test_can_iterate_over_inserted_chunks_of_async_iterable(self):
+        async def get_comments():
+            for number in range(12):
+                yield Comment(text=str(number))
+
+        chunks = []
+        async for chunk in Comment.objects.iter_bulk_insert(get_comments(), chunk_size=5):
+            chunks.append(chunk)
+
+        expect(sorted(len(chunk) for chunk in chunks)).to_be_like([2, 5, 5])
+        for chunk in chunks:
+            for comment in chunk:
+                expect(comment._id).not_to_be_null()
+
     @async_test
     @asyncio.coroutine
     def test_cant_insert_wrong_document_in_bulk(self):
@@ -74,3 +103,96 @@ class TestBulkInsert(AsyncTestCase):
             )
         else:
             assert False, "Should not have gotten this far"
+
+    @async_test
+    @asyncio.coroutine
+    def test_invalid_document_in_bulk_stops_the_insert(self):
+        comments = [Comment(text=str(number)) for number in range(10)]
+        comments.append(Comment(text=None))
+
+        try:
+            yield from Comment.objects.bulk_insert(iter(comments), chunk_size=3)
+        except BulkInsertError:
+            err = sys.exc_info()[1]
+            expect(err.inserted).to_equal(9)
+        else:
+            assert False, "Should not have gotten this far"
+
+        count = yield from Comment.objects.count()
+        expect(count).to_equal(9)
+
+
+class TestBulk(AsyncTestCase):
+    def setUp(self):
+        super(TestBulk, self).setUp()
+        self.drop_coll("CommentBulk")
+
+    @async_test
+    @asyncio.coroutine
+    def test_can_write_mixed_operations_in_chunks(self):
+        to_update = yield from Comment.objects.create(text="to update")
+        to_delete = yield from Comment.objects.create(text="to delete")
+
+        bulk = Comment.objects.bulk(chunk_size=3)
+        comments = [Comment(text=str(number)) for number in range(5)]
+        for comment in comments:
+            bulk.insert(comment)
+
+        to_update.text = "updated"
+        bulk.update(to_update)
+        bulk.delete(to_delete)
+
+        upserted = Comment(text="upserted")
+        bulk.upsert(upserted)
+
+        result = yield from bulk.execute()
+
+        expect(result.inserted_count).to_equal(5)
+        expect(result.matched_count).to_equal(1)
+        expect(result.deleted_count).to_equal(1)
+        expect(result.upserted_ids).to_be_like([upserted._id])
+        expect(result.inserted_ids).to_be_like([comment._id for comment in comments])
+        expect(result.errors).to_be_empty()
+
+        count = yield from Comment.objects.count()
+        expect(count).to_equal(7)
+
+        updated = yield from Comment.objects.get(to_update._id)
+        expect(updated.text).to_equal("updated")
+
+    @async_test
+    @asyncio.coroutine
+    def test_unordered_bulk_reports_errors_and_keeps_writing(self):
+        existing = yield from Comment.objects.create(text="existing")
+
+        comments = [
+            Comment(text="first"),
+            Comment(_id=existing._id, text="duplicated"),
+            Comment(text="last"),
+        ]
+
+        bulk = Comment.objects.bulk(ordered=False, chunk_size=2)
+        for comment in comments:
+            bulk.insert(comment)
+
+        result = yield from bulk.execute()
+
+        expect(result.inserted_count).to_equal(2)
+        expect(result.errors).to_length(1)
+        expect(result.errors[0].index).to_equal(1)
+        expect(result.errors[0].document).to_equal(comments[1])
+        expect(result.errors[0].code).to_equal(11000)
+        expect(comments[2]._id).not_to_be_null()
+
+    @async_test
+    @asyncio.coroutine
+    def test_cant_update_unsaved_document_in_bulk(self):
+        try:
+            Comment.objects.bulk().update(Comment(text="unsaved"))
+        except ValueError:
+            err = sys.exc_info()[1]
+            expect(err).to_have_an_error_message_of(
+                "Can't update a document that was not saved yet."
+            )
+        else:
+            assert False, "Should not have gotten this far"
@@ -60,3 +60,63 @@ class TestConnect(AsyncTestCase):
         res = yield from db.ping()
         ping_result = res['ok']
         expect(ping_result).to_equal(1.0)
+
+    def test_database_and_collections_are_reused_until_disconnected(self):
+        from motorengine.aiomotorengine.connection import disconnect, get_connection
+
+        db = connect('test', host="localhost", port=27017, io_loop=self.io_loop)
+
+        expect(get_connection()).to_equal(db)
+        expect(get_connection(db='test')).to_equal(db)
+        expect(db['User']).to_equal(db['User'])
+
+        disconnect()
+        other_db = connect('test', host="localhost", port=27017, io_loop=self.io_loop)
+
+        expect(other_db).not_to_equal(db)
+
+    @async_test
+    @asyncio.coroutine
+    def test_can_connect_asynchronously(self):
+        from motorengine.aiomotorengine.connection import connect_async, ensure_connected
+
+        db = yield from connect_async('test', host="localhost", port=27017, io_loop=self.io_loop)
+
+        res = yield from db.ping()
+        expect(res['ok']).to_equal(1.0)
+
+        connected_db = yield from ensure_connected()
+        expect(connected_db).to_equal(db)
+
+    def test_connect_sets_up_the_connection_pool(self):
+        from motorengine.aiomotorengine.connection import get_pool_stats
+
+        connect('test', host="localhost", port=27017, io_loop=self.io_loop,
+                max_pool_size=20, min_pool_size=2, wait_queue_timeout_ms=500)
+
+        stats = get_pool_stats()
+        expect(stats.max_pool_size).to_equal(20)
+        expect(stats.min_pool_size).to_equal(2)
+        expect(stats.wait_queue_timeout_ms).to_equal(500)
+
+    def test_pool_stats_fail_clearly_without_the_driver_internals(self):
+        from motorengine.base.pool import get_pool_stats
+
+        try:
+            get_pool_stats(object(), {})
+        except RuntimeError as err:
+            expect(str(err)).to_include("Can't read the connection pools")
+        else:
+            assert False, "Should not have gotten this far"
+
+    @async_test
+    @asyncio.coroutine
+    def test_can_warm_up_the_connection_pool(self):
+        from motorengine.aiomotorengine.connection import warm_up
+
+        connect('test', host="localhost", port=27017, io_loop=self.io_loop)
+
+        stats = yield from warm_up(connections=3)
+
+        expect(stats.checked_out).to_equal(0)
+        expect(stats.available).to_be_greater_than_or_equal_to(1)
@@ -4,11 +4,12 @@ from uuid import uuid4
 from datetime import datetime
 
 from preggy import expect
+from pymongo import monitoring
 
 from motorengine.aiomotorengine import (
     Document, StringField, BooleanField, ListField,
-    EmbeddedDocumentField, ReferenceField, DESCENDING,
-    URLField, DateTimeField, UUIDField, IntField, JsonField
+    EmbeddedDocumentField, ReferenceField, ASCENDING, DESCENDING,
+    URLField, DateTimeField, UUIDField, IntField, JsonField, DictField, ReadPreference, connect
 )
 from motorengine.errors import (
     InvalidDocumentError, LoadReferencesRequiredError, UniqueKeyViolationError
@@ -956,6 +957,86 @@ class TestDocument(AsyncTestCase):
 
         expect(count).to_equal(4)
 
+    @async_test
+    @asyncio.coroutine
+    def test_can_update_documents_with_update_operators(self):
+        user = yield from User.objects.create(email="heynemann@gmail.com")
+        post = yield from Post.objects.create(title="Some post", body="Some body")
+
+        result = yield from Post.objects.filter(title="Some post").update(
+            push__comments=Comment(text="first comment", user=user),
+            set__body="Other body"
+        )
+        expect(result.count).to_equal(1)
+
+        yield from Post.objects.update(
+            push__comments=[
+                Comment(text="second comment", user=user),
+                Comment(text="third comment", user=user),
+            ]
+        )
+        yield from Post.objects.update(unset__title=True)
+
+        post = yield from Post.objects.get(post._id)
+        expect(post.title).to_be_null()
+        expect(post.body).to_equal("Other body")
+        expect([comment.text for comment in post.comments]).to_be_like(
+            ["first comment", "second comment", "third comment"]
+        )
+
+    @async_test
+    @asyncio.coroutine
+    def test_can_modify_and_pop_documents_atomically(self):
+        yield from User.objects.create(email="email1@gmail.com", first_name="First1")
+        yield from User.objects.create(email="email2@gmail.com", first_name="First2")
+
+        user = yield from User.objects.filter(first_name__in=["First1", "First2"]) \
+            .order_by("email", DESCENDING).modify(set__first_name="Modified")
+        expect(user.email).to_equal("email2@gmail.com")
+        expect(user.first_name).to_equal("Modified")
+
+        user = yield from User.objects.filter(first_name="First1").modify(
+            {User.first_name: "Modified"}, new=False
+        )
+        expect(user.first_name).to_equal("First1")
+
+        user = yield from User.objects.filter(first_name="First1").modify(set__last_name="Else")
+        expect(user).to_be_null()
+
+        user = yield from User.objects.order_by("email").pop_one()
+        expect(user.email).to_equal("email1@gmail.com")
+
+        count = yield from User.objects.count()
+        expect(count).to_equal(1)
+
+    @async_test
+    @asyncio.coroutine
+    def test_modify_and_pop_one_send_the_max_time_to_the_server(self):
+        commands = []
+
+        class CommandRecorder(monitoring.CommandListener):
+            def started(self, event):
+                if event.command_name == "findAndModify":
+                    commands.append(event.command)
+
+            def succeeded(self, event):
+                pass
+
+            def failed(self, event):
+                pass
+
+        connect("test", host="localhost", port=27017, io_loop=self.io_loop,
+                alias="monitored", event_listeners=[CommandRecorder()])
+
+        yield from User.objects.create(email="email@gmail.com", alias="monitored")
+        yield from User.objects.max_time_ms(5000).modify(set__first_name="Modified", alias="monitored")
+        yield from User.objects.max_time_ms(5000).pop_one(alias="monitored")
+
+        expect(commands).to_length(2)
+        for command in commands:
+            expect(command["maxTimeMS"]).to_equal(5000)
+            expect(command).not_to_include("max_time_ms")
+
     @async_test
     @asyncio.coroutine
     def test_skip(self):
@@ -1244,7 +1325,7 @@ class TestDocument(AsyncTestCase):
         ])
 
         docs_cursor = ElemMatchEmbeddedParentDocument.objects
-        docs_cursor.filter(items__name="b")
+        docs_cursor = docs_cursor.filter(items__name="b")
         loaded_document = yield from docs_cursor.find_all()
 
         expect(loaded_document).to_length(1)
@@ -1329,3 +1410,446 @@ class TestDocument(AsyncTestCase):
 
         expect(base.list_val).to_length(3)
         expect(base.list_val[0]).to_be_instance_of(Ref)
+
+    @async_test
+    @asyncio.coroutine
+    def test_list_field_with_reference_field_keeps_order_when_loading_in_bulk(self):
+        class Ref(Document):
+            __collection__ = 'ref'
+            val = StringField()
+
+        class Base(Document):
+            __collection__ = 'base'
+            list_val = ListField(ReferenceField(reference_document_type=Ref))
+            main_ref = ReferenceField(reference_document_type=Ref)
+
+        yield from Ref.objects.delete()
+        yield from Base.objects.delete()
+
+        refs = []
+        for index in range(20):
+            ref = yield from Ref.objects.create(val="v%d" % index)
+            refs.append(ref)
+
+        list_val = list(reversed(refs)) + [refs[3]]
+        base = yield from Base.objects.create(list_val=list_val, main_ref=refs[5])
+
+        base = yield from Base.objects.get(base._id)
+        result = yield from base.load_references()
+
+        expect(result['loaded_reference_count']).to_equal(22)
+        expect([ref.val for ref in base.list_val]).to_be_like(
+            [ref.val for ref in list_val]
+        )
+        expect(base.main_ref.val).to_equal("v5")
+
+    @async_test
+    @asyncio.coroutine
+    def test_find_all_without_lazy_resolves_references_of_every_document(self):
+        class ReferenceFieldClass(Document):
+            __collection__ = "TestFindAllManyReferences"
+            ref1 = ReferenceField(User)
+            ref2 = ReferenceField(User)
+
+        yield from ReferenceFieldClass.objects.delete()
+
+        users = []
+        for index in range(3):
+            user = yield from User.objects.create(
+                email="user%d@gmail.com" % index, first_name="User%d" % index
+            )
+            users.append(user)
+
+        for index in range(6):
+            yield from ReferenceFieldClass.objects.create(
+                ref1=users[index % 3], ref2=users[(index + 1) % 3]
+            )
+
+        result = yield from ReferenceFieldClass.objects.find_all(lazy=False)
+
+        expect(result).to_length(6)
+        for index, item in enumerate(result):
+            expect(item.ref1.first_name).to_equal("User%d" % (index % 3))
+            expect(item.ref2.first_name).to_equal("User%d" % ((index + 1) % 3))
+
+    @async_test
+    async def test_can_iterate_over_documents_in_batches(self):
+        for index in range(25):
+            await User.objects.create(
+                email="user%d@gmail.com" % index, first_name="User%d" % index
+            )
+
+        emails = []
+        async for user in User.objects.filter(email__ne="user0@gmail.com"):
+            emails.append(user.email)
+
+        expect(emails).to_length(24)
+
+        users = []
+        async for user in User.objects.limit(7).iterate(batch_size=3):
+            users.append(user)
+
+        expect(users).to_length(7)
+        expect(users[0]).to_be_instance_of(User)
+
+    def test_can_set_cursor_options(self):
+        queryset = User.objects.batch_size(50).max_time_ms(200).no_cursor_timeout() \
+            .hint([('email', DESCENDING)]).comment('listing users')
+
+        expect(queryset._get_cursor_options()).to_be_like({
+            'batch_size': 50,
+            'max_time_ms': 200,
+            'no_cursor_timeout': True,
+            'hint': [('email', DESCENDING)],
+            'comment': 'listing users',
+        })
+
+    def test_can_set_read_preference_and_concerns(self):
+        queryset = User.objects.read_preference(ReadPreference.SECONDARY_PREFERRED, tags=[{'dc': 'ny'}]) \
+            .read_concern('majority').write_concern(w=1, j=True)
+
+        coll = queryset.coll()
+        expect(coll.read_preference.mongos_mode).to_equal('secondaryPreferred')
+        expect(coll.read_preference.tag_sets).to_be_like([{'dc': 'ny'}])
+        expect(coll.read_concern.level).to_equal('majority')
+        expect(coll.write_concern.document).to_be_like({'w': 1, 'j': True})
+
+        expect(queryset.coll()).to_equal(coll)
+        expect(User.objects.coll().read_preference).to_equal(ReadPreference.PRIMARY)
+
+        with expect.error_to_happen(ValueError):
+            User.objects.read_preference(ReadPreference.PRIMARY, tags=[{'dc': 'ny'}])
+
+        with expect.error_to_happen(ValueError):
+            User.objects.read_preference(ReadPreference.PRIMARY, max_staleness=120)
+
+    def test_can_set_concerns_in_the_document_class(self):
+        class MajorityDocument(Document):
+            __read_concern__ = 'majority'
+            __write_concern__ = {'w': 'majority'}
+
+            name = StringField()
+
+        coll = MajorityDocument.objects.coll()
+        expect(coll.read_concern.level).to_equal('majority')
+        expect(coll.write_concern.document).to_be_like({'w': 'majority'})
+        expect(MajorityDocument.objects.coll()).to_equal(coll)
+
+    @async_test
+    @asyncio.coroutine
+    def test_can_find_with_cursor_options(self):
+        yield from User.objects.create(email="heynemann@gmail.com")
+
+        users = yield from User.objects.batch_size(1).max_time_ms(5000) \
+            .comment('test_can_find_with_cursor_options').find_all()
+
+        expect(users).to_length(1)
+
+    @async_test
+    @asyncio.coroutine
+    def test_indexes_are_ensured_only_once(self):
+        from motorengine.base import indexes_registry
+        indexes_registry.clear()
+
+        expect(User.objects.is_index_ensured()).to_be_false()
+
+        yield from User.objects.create(email="heynemann@gmail.com")
+        expect(User.objects.is_index_ensured()).to_be_true()
+
+        yield from User.objects.create(email="heynemann2@gmail.com")
+        expect(indexes_registry).to_length(1)
+
+    @async_test
+    @asyncio.coroutine
+    def test_indexes_are_ensured_for_each_class_of_a_collection(self):
+        class PlainSharedDocument(Document):
+            __collection__ = "SharedCollection"
+            name = StringField()
+
+        class UniqueSharedDocument(Document):
+            __collection__ = "SharedCollection"
+            name = StringField(unique=True)
+
+        yield from self.drop_coll_async("SharedCollection")
+
+        yield from PlainSharedDocument.objects.create(name="plain")
+        expect(UniqueSharedDocument.objects.is_index_ensured()).to_be_false()
+
+        yield from UniqueSharedDocument.objects.create(name="test")
+        with expect.error_to_happen(UniqueKeyViolationError):
+            yield from UniqueSharedDocument.objects.create(name="test")
+
+    def test_can_get_field_by_db_name(self):
+        class DbFieldDocument(Document):
+            name = StringField(db_field="n")
+            other = StringField()
+
+        expect(DbFieldDocument.get_field_by_db_name("n")).to_equal(DbFieldDocument._fields["name"])
+        expect(DbFieldDocument.get_field_by_db_name("_n")).to_equal(DbFieldDocument._fields["name"])
+        expect(DbFieldDocument.get_field_by_db_name("other")).to_equal(DbFieldDocument._fields["other"])
+        expect(DbFieldDocument.get_field_by_db_name("name")).to_be_null()
+
+        doc = DbFieldDocument.from_son({"n": "a", "other": "b"})
+        expect(doc.name).to_equal("a")
+        expect(doc.other).to_equal("b")
+
+    def test_fields_are_read_through_descriptors(self):
+        from motorengine.base.descriptors import FieldDescriptor, ReferenceFieldDescriptor
+
+        expect(User.__dict__['email']).to_be_instance_of(FieldDescriptor)
+        expect(Comment.__dict__['user']).to_be_instance_of(ReferenceFieldDescriptor)
+        expect(User.email).to_be_instance_of(StringField)
+        expect(Employee.email).to_equal(User.email)
+
+        user = Employee(email="heynemann@gmail.com", emp_number="123")
+        expect(user.email).to_equal("heynemann@gmail.com")
+        expect(user.emp_number).to_equal("123")
+        expect(user.last_name).to_equal("Heynemann")
+
+        user.dynamic_value = 10
+        expect(user.dynamic_value).to_equal(10)
+
+        try:
+            user.invalid_attribute
+        except AttributeError:
+            err = sys.exc_info()[1]
+            expect(err).to_have_an_error_message_of("'Employee' object has no attribute 'invalid_attribute'")
+        else:
+            assert False, "Should not have gotten this far"
+
+    @async_test
+    @asyncio.coroutine
+    def test_can_save_and_load_compact_documents(self):
+        class CompactUser(Document):
+            __collection__ = "TestCompactUser"
+            __compact__ = True
+
+            email = StringField(required=True)
+            first_name = StringField(default="Bernardo")
+
+        class CompactEmployee(CompactUser):
+            emp_number = StringField()
+
+        yield from self.drop_coll_async(CompactUser.__collection__)
+
+        employee = CompactEmployee(email="heynemann@gmail.com", emp_number="123")
+        expect(hasattr(employee, '__dict__')).to_be_false()
+        expect(CompactEmployee.__slots__).to_be_like(('_value_emp_number', ))
+
+        employee.dynamic_value = 10
+        expect(employee.dynamic_value).to_equal(10)
+        expect(employee._dynamic_values).to_be_like({'dynamic_value': 10})
+
+        yield from employee.save()
+
+        loaded_employee = yield from CompactEmployee.objects.get(employee._id)
+
+        expect(loaded_employee.email).to_equal("heynemann@gmail.com")
+        expect(loaded_employee.first_name).to_equal("Bernardo")
+        expect(loaded_employee.emp_number).to_equal("123")
+        expect(loaded_employee.dynamic_value).to_equal(10)
+
+    @async_test
+    @asyncio.coroutine
+    def test_dynamic_fields_do_not_change_the_document_class(self):
+        class DynamicFieldDocument(Document):
+            __collection__ = "TestDynamicFieldDocumentPerInstance"
+            name = StringField()
+
+        yield from self.drop_coll_async(DynamicFieldDocument.__collection__)
+
+        doc = yield from DynamicFieldDocument.objects.create(name="a", a=1)
+        doc.b = 2
+        yield from doc.save()
+
+        expect(list(DynamicFieldDocument._fields.keys())).to_be_like(["name"])
+        expect(DynamicFieldDocument(name="b").to_son()).to_be_like({"name": "b"})
+
+        loaded_document = yield from DynamicFieldDocument.objects.get(b=2)
+
+        expect(loaded_document._id).to_equal(doc._id)
+        expect(loaded_document.a).to_equal(1)
+        expect(loaded_document.b).to_equal(2)
+        expect(list(DynamicFieldDocument._fields.keys())).to_be_like(["name"])
+
+    @async_test
+    @asyncio.coroutine
+    def test_can_load_documents_in_raw_bson_mode(self):
+        yield from self.drop_coll_async(Post.__collection__)
+
+        user = yield from User.objects.create(email="heynemann@gmail.com", first_name="Bernardo")
+        post = yield from Post.objects.create(title="raw post", body="body", comments=[], dynamic_value=10)
+
+        loaded_user = yield from User.objects.raw_bson().get(user._id)
+
+        expect(loaded_user._id).to_equal(user._id)
+        expect(loaded_user._values._values).to_be_empty()
+        expect(loaded_user.email).to_equal("heynemann@gmail.com")
+        expect(list(loaded_user._values._values.keys())).to_be_like(["email"])
+        expect(loaded_user.first_name).to_equal("Bernardo")
+
+        loaded_posts = yield from Post.objects.raw_bson().filter(title="raw post").find_all()
+
+        expect(loaded_posts).to_length(1)
+        expect(loaded_posts[0].title).to_equal("raw post")
+        expect(loaded_posts[0].dynamic_value).to_equal(10)
+
+        loaded_posts[0].title = "updated post"
+        yield from loaded_posts[0].save()
+
+        updated_post = yield from Post.objects.get(post._id)
+
+        expect(updated_post.title).to_equal("updated post")
+        expect(updated_post.body).to_equal("body")
+        expect(updated_post.dynamic_value).to_equal(10)
+
+    def test_objects_is_reused_and_modifiers_return_new_querysets(self):
+        expect(User.objects).to_equal(User.objects)
+
+        queryset = User.objects.filter(email="heynemann@gmail.com")
+        limited_queryset = queryset.limit(10).order_by(User.email).only("email")
+
+        expect(User.objects._filters).to_be_null()
+        expect(queryset).not_to_equal(User.objects)
+        expect(queryset._limit).to_be_null()
+        expect(queryset._order_fields).to_be_empty()
+        expect(queryset._loaded_fields.fields).to_be_empty()
+
+        expect(limited_queryset._filters).to_equal(queryset._filters)
+        expect(limited_queryset._limit).to_equal(10)
+        expect(limited_queryset._order_fields).to_be_like([("email", 1)])
+        expect(limited_queryset._loaded_fields.fields).to_be_like({"email"})
+
+    @async_test
+    @asyncio.coroutine
+    def test_querysets_can_be_executed_more_than_once(self):
+        yield from User.objects.create(email="heynemann@gmail.com")
+        yield from User.objects.create(email="someone@gmail.com")
+
+        queryset = User.objects.filter(email="heynemann@gmail.com")
+
+        users = yield from queryset.find_all()
+        expect(users).to_length(1)
+
+        count = yield from queryset.count()
+        expect(count).to_equal(1)
+
+        users = yield from queryset.find_all()
+        expect(users).to_length(1)
+
+    @async_test
+    @asyncio.coroutine
+    def test_can_paginate_after_the_last_document_of_a_page(self):
+        for index in range(7):
+            yield from User.objects.create(
+                email="user%d@gmail.com" % index, first_name="User%d" % (index % 3)
+            )
+
+        queryset = User.objects.order_by("first_name", DESCENDING)
+
+        page = yield from queryset.paginate_after(page_size=3)
+        expect([user.first_name for user in page.documents]).to_be_like(["User2", "User2", "User1"])
+        expect(page.next_token).not_to_be_null()
+
+        next_page = yield from queryset.paginate_after(page.next_token, page_size=3)
+        expect([user.first_name for user in next_page.documents]).to_be_like(["User1", "User0", "User0"])
+
+        same_page = yield from queryset.paginate_after(page.documents[-1], page_size=3)
+        expect([user._id for user in same_page.documents]).to_be_like(
+            [user._id for user in next_page.documents]
+        )
+
+        last_page = yield from queryset.paginate_after(next_page.next_token, page_size=3)
+        expect([user.first_name for user in last_page.documents]).to_be_like(["User0"])
+        expect(last_page.next_token).to_be_null()
+
+    def test_partial_updates_opt_out_is_inherited(self):
+        class FullUpdateUser(Document):
+            __partial_updates__ = False
+            email = StringField()
+
+        class FullUpdateEmployee(FullUpdateUser):
+            emp_number = StringField()
+
+        class PartialUpdateEmployee(FullUpdateUser):
+            __partial_updates__ = True
+
+        expect(FullUpdateEmployee.__partial_updates__).to_be_false()
+        expect(PartialUpdateEmployee.__partial_updates__).to_be_true()
+        expect(User.__partial_updates__).to_be_true()
+
+    @async_test
+    @asyncio.coroutine
+    def test_can_paginate_partly_loaded_documents_with_null_order_values(self):
+        for index in range(6):
+            yield from User.objects.create(
+                email="user%d@gmail.com" % index,
+                last_name=None if index % 2 else "Last%d" % index
+            )
+
+        for direction in (ASCENDING, DESCENDING):
+            queryset = User.objects.order_by(User.last_name, direction).only('email')
+
+            emails = []
+            page = yield from queryset.paginate_after(page_size=2)
+            emails.extend(user.email for user in page.documents)
+            while page.next_token is not None:
+                page = yield from queryset.paginate_after(page.next_token, page_size=2)
+                emails.extend(user.email for user in page.documents)
+
+            expect(sorted(emails)).to_be_like(["user%d@gmail.com" % index for index in range(6)])
+
+    @async_test
+    @asyncio.coroutine
+    def test_saving_loaded_document_only_sends_its_changes(self):
+        user = yield from User.objects.create(email="heynemann@gmail.com")
+        post = yield from Post.objects.create(
+            title="Some post", body="Some body",
+            comments=[Comment(text="first comment", user=user)]
+        )
+        expect(post.get_changes()).to_be_null()
+
+        post = yield from Post.objects.get(post._id)
+        expect(post.get_changes()).to_be_empty()
+
+        post.title = "Other post"
+        post.comments.append(Comment(text="second comment", user=user))
+
+        changes = post.get_changes()
+        expect(changes['$set']).to_be_like({'title': 'Other post'})
+        expect(changes['$push']['comments']['$each']).to_length(1)
+
+        yield from post.save()
+        expect(post.get_changes()).to_be_empty()
+
+        post = yield from Post.objects.get(post._id)
+        expect(post.title).to_equal("Other post")
+        expect(post.body).to_equal("Some body")
+        expect([comment.text for comment in post.comments]).to_be_like(
+            ["first comment", "second comment"]
+        )
+
+    @async_test
+    @asyncio.coroutine
+    def test_saving_loaded_document_sets_lists_and_dicts_changed_in_place(self):
+        class TrackedDocument(Document):
+            tags = ListField(StringField())
+            data = DictField()
+
+        yield from self.drop_coll_async(TrackedDocument.__collection__)
+
+        doc = yield from TrackedDocument.objects.create(tags=["a", "b"], data={"counts": [1]})
+        doc = yield from TrackedDocument.objects.get(doc._id)
+
+        doc.data["counts"].append(2)
+        expect(doc.get_changes()).to_be_like({"$set": {"data": {"counts": [1, 2]}}})
+
+        doc.tags.remove("a")
+        expect(doc.get_changes()["$set"]["tags"]).to_be_like(["b"])
+
+        yield from doc.save()
+        expect(doc.get_changes()).to_be_empty()
+
+        doc = yield from TrackedDocument.objects.get(doc._id)
+        expect(doc.tags).to_be_like(["b"])
+        expect(doc.data).to_be_like({"counts": [1, 2]})
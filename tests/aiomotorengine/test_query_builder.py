@@ -7,7 +7,9 @@ from motorengine.aiomotorengine import (
     Document, StringField, BooleanField, ListField, IntField,
     URLField, DateTimeField, Q, EmbeddedDocumentField
 )
-from motorengine.query_builder.node import QCombination
+from motorengine.query_builder.node import Param
+from motorengine.query_builder import node
+from motorengine.query_builder.node import QCombination, SimplificationVisitor, QueryCompilerVisitor
 from tests.aiomotorengine import AsyncTestCase, async_test
 
 
@@ -234,6 +236,50 @@ class TestQueryBuilder(AsyncTestCase):
         expect(users[0]._id).to_equal(self.user2._id)
         expect(users[1]._id).to_equal(self.user3._id)
 
+    def test_reuses_compiled_query_plans_for_queries_with_the_same_shape(self):
+        query = Q(first_name="Test") & Q(numbers__in=[1, 2])
+        expect(query.to_query(User)).to_be_like({
+            "whatever": "Test",
+            "numbers": {"$in": [1, 2]}
+        })
+
+        plan_count = len(node._query_plans)
+
+        query = Q(first_name="Else") & Q(numbers__in=[3])
+        expect(query.to_query(User)).to_be_like({
+            "whatever": "Else",
+            "numbers": {"$in": [3]}
+        })
+        expect(node._query_plans).to_length(plan_count)
+
+    def test_compiling_a_query_does_not_change_it(self):
+        query = Q(first_name="Test") | Q(last_name="Else")
+        query.to_query(User)
+
+        expect(query.children[0]).to_be_instance_of(Q)
+        expect(query.children[1]).to_be_instance_of(Q)
+        expect(query.to_query(User)).to_be_like({
+            "$or": [{"whatever": "Test"}, {"last_name": "Else"}]
+        })
+
+    def test_visiting_a_query_does_not_change_it(self):
+        query = Q(first_name="Test") & (Q(last_name="Else") | Q(numbers=1))
+
+        for i in range(2):
+            query_result = query.accept(SimplificationVisitor(), User)
+            query_result = query_result.accept(QueryCompilerVisitor(User), User)
+
+            expect(query_result).to_be_like({
+                "$and": [
+                    {"whatever": "Test"},
+                    {"$or": [{"last_name": "Else"}, {"numbers": 1}]}
+                ]
+            })
+
+        expect(query.children[0]).to_be_instance_of(Q)
+        expect(query.children[1]).to_be_instance_of(QCombination)
+        expect(query.children[1].children[0]).to_be_instance_of(Q)
+
     def test_can_query_using_not_in(self):
         names = ["Someone", "John"]
 
@@ -255,3 +301,95 @@ class TestQueryBuilder(AsyncTestCase):
 
         expect(users).to_length(1)
         expect(users[0].first_name).to_equal("Bernardo")
+
+    def test_prepared_query_only_converts_its_parameters(self):
+        find_users = User.objects.prepare(first_name=Param("name"), numbers__in=[1, 2])
+
+        expect(find_users.params).to_be_like({"name"})
+        expect(find_users.bind(name="Bernardo")._get_query()).to_be_like({
+            "whatever": "Bernardo",
+            "numbers": {"$in": [1, 2]}
+        })
+        expect(find_users.bind(name="John")._get_query()).to_be_like({
+            "whatever": "John",
+            "numbers": {"$in": [1, 2]}
+        })
+
+        with expect.error_to_happen(ValueError, message="No value given for the query parameter 'name'."):
+            find_users.bind()
+
+    def test_filters_of_bound_prepared_queries_are_kept(self):
+        find_users = User.objects.prepare(first_name=Param("name"))
+
+        expect(find_users.bind(name="Bernardo").filter(is_admin=False)._get_query()).to_be_like({
+            "$and": [{"whatever": "Bernardo"}, {"is_admin": False}]
+        })
+
+    @async_test
+    @asyncio.coroutine
+    def test_can_query_using_prepared_queries(self):
+        yield from self.create_test_users()
+
+        find_user = User.objects.prepare(first_name=Param("name"), last_name=Param("last_name"))
+
+        user = yield from find_user.get(name="Someone", last_name="Else")
+        expect(user._id).to_equal(self.user2._id)
+
+        user = yield from find_user.get(name="John", last_name="Doe")
+        expect(user._id).to_equal(self.user3._id)
+
+        users = yield from find_user.find_all(name="Bernardo", last_name="Heynemann")
+        expect(users).to_length(1)
+        expect(users[0]._id).to_equal(self.user._id)
+
+    def test_can_compile_update_operators(self):
+        update = User.objects.transform_definition({
+            User.last_name: "Else",
+            "inc__numbers__0": 1,
+            "push__numbers": [2, 3],
+            "pull__numbers": 4,
+            "set__embedded__test": "test",
+            "unset__first_name": True,
+        })
+
+        expect(update).to_be_like({
+            "$set": {"last_name": "Else", "embedded_document.other": "test"},
+            "$inc": {"numbers.0": 1},
+            "$push": {"numbers": {"$each": [2, 3]}},
+            "$pull": {"numbers": 4},
+            "$unset": {"whatever": ""},
+        })
+
+    def test_sets_fields_by_db_field_in_update(self):
+        update = User.objects.transform_definition({
+            "first_name": "Name",
+            User.is_admin: 0,
+            "embedded__test": "test",
+        })
+
+        expect(update).to_be_like({
+            "$set": {"whatever": "Name", "is_admin": False, "embedded_document.other": "test"},
+        })
+
+    def test_keeps_embedded_documents_given_as_dicts_in_update(self):
+        update = User.objects.transform_definition({
+            "embedded": {"other": "test"},
+            "set__nullable": EmbeddedDocument(test="other"),
+        })
+
+        expect(update).to_be_like({
+            "$set": {
+                "embedded_document": {"other": "test"},
+                "nullable_embedded_document": {"other": "other"},
+            },
+        })
+
+    @async_test
+    @asyncio.coroutine
+    def test_can_increment_in_update(self):
+        yield from self.create_test_users()
+
+        yield from User.objects.filter(last_name="Heynemann").update(inc__numbers__0=10)
+
+        user = yield from User.objects.get(self.user._id)
+        expect(user.numbers[0]).to_equal(11)
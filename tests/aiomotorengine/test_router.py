@@ -0,0 +1,121 @@
+import asyncio
+
+from preggy import expect
+
+from motorengine import DESCENDING
+from motorengine.aiomotorengine import (
+    Document, StringField, IntField, ReferenceField, HashRouter, connect
+)
+from motorengine.errors import UnroutableQueryError
+from tests.aiomotorengine import AsyncTestCase, async_test
+
+
+SHARDS = ("test_shard_a", "test_shard_b")
+
+
+class Order(Document):
+    __collection__ = "RoutedOrder"
+    __router__ = HashRouter('tenant_id', SHARDS)
+
+    tenant_id = StringField(required=True)
+    number = IntField()
+
+
+class Customer(Document):
+    __collection__ = "AliasedCustomer"
+
+    name = StringField()
+
+
+class Invoice(Document):
+    __collection__ = "AliasedInvoice"
+    __lazy__ = False
+
+    customer = ReferenceField(Customer)
+
+
+class TestRouter(AsyncTestCase):
+    def setUp(self):
+        super(TestRouter, self).setUp()
+
+        self.shards = {}
+        for alias in SHARDS:
+            self.shards[alias] = connect(
+                alias, host="localhost", port=27017, io_loop=self.io_loop, alias=alias
+            )
+            for collection in ("RoutedOrder", "AliasedCustomer", "AliasedInvoice"):
+                self.io_loop.run_until_complete(self.shards[alias][collection].drop())
+
+    @asyncio.coroutine
+    def create_orders(self):
+        orders = []
+        for number in range(20):
+            order = yield from Order.objects.create(tenant_id="tenant-%d" % (number % 4), number=number)
+            orders.append(order)
+        return orders
+
+    @async_test
+    @asyncio.coroutine
+    def test_saves_documents_in_the_alias_of_their_key(self):
+        orders = yield from self.create_orders()
+
+        for order in orders:
+            alias = Order.__router__.get_alias(order.tenant_id)
+            stored = yield from self.shards[alias]["RoutedOrder"].find_one({'_id': order._id})
+            expect(stored).not_to_be_null()
+
+        tenant_orders = yield from Order.objects.filter(tenant_id="tenant-1").order_by(Order.number).find_all()
+        expect([order.number for order in tenant_orders]).to_equal([1, 5, 9, 13, 17])
+
+    @async_test
+    @asyncio.coroutine
+    def test_queries_all_the_aliases_without_the_key(self):
+        yield from self.create_orders()
+
+        count = yield from Order.objects.count()
+        expect(count).to_equal(20)
+
+        orders = yield from Order.objects.order_by(Order.number, DESCENDING).skip(2).limit(5).find_all()
+        expect([order.number for order in orders]).to_equal([17, 16, 15, 14, 13])
+
+    @async_test
+    async def test_iterates_over_all_the_aliases_without_the_key(self):
+        await self.create_orders()
+
+        numbers = []
+        async for order in Order.objects.order_by(Order.number, DESCENDING).skip(2).limit(5).iterate(batch_size=2):
+            numbers.append(order.number)
+
+        expect(numbers).to_equal([17, 16, 15, 14, 13])
+
+        numbers = []
+        async for order in Order.objects:
+            numbers.append(order.number)
+
+        expect(sorted(numbers)).to_equal(list(range(20)))
+
+    @async_test
+    @asyncio.coroutine
+    def test_raises_when_the_alias_of_an_update_cant_be_told(self):
+        yield from self.create_orders()
+
+        try:
+            yield from Order.objects.filter(number=1).update(number=2)
+        except UnroutableQueryError:
+            pass
+        else:
+            assert False, "Should not have gotten this far"
+
+        result = yield from Order.objects.filter(tenant_id="tenant-2").update(inc__number=100)
+        expect(result.count).to_equal(5)
+
+    @async_test
+    @asyncio.coroutine
+    def test_loads_references_in_bulk_from_the_given_alias(self):
+        alias = SHARDS[1]
+        customer = yield from Customer.objects.create(name="Someone", alias=alias)
+        invoice = yield from Invoice.objects.create(customer=customer, alias=alias)
+
+        invoices = yield from Invoice.objects.in_bulk([invoice._id], alias=alias)
+
+        expect(invoices[invoice._id].customer.name).to_equal("Someone")
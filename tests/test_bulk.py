@@ -9,6 +9,7 @@ from tornado.testing import gen_test
 from motorengine import (
     Document, StringField
 )
+from motorengine.errors import BulkInsertError
 from tests import AsyncTestCase
 
 
@@ -74,3 +75,19 @@ class TestBulkInsert(AsyncTestCase):
             )
         else:
             assert False, "Should not have gotten this far"
+
+    @gen_test
+    def test_invalid_document_in_bulk_stops_the_insert(self):
+        comments = [Comment(text=str(number)) for number in range(10)]
+        comments.append(Comment(text=None))
+
+        try:
+            yield Comment.objects.bulk_insert(iter(comments), chunk_size=3)
+        except BulkInsertError:
+            err = sys.exc_info()[1]
+            expect(err.inserted).to_equal(9)
+        else:
+            assert False, "Should not have gotten this far"
+
+        count = yield Comment.objects.count()
+        expect(count).to_equal(9)
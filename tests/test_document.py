@@ -6,6 +6,7 @@ from uuid import uuid4
 from datetime import datetime
 
 from preggy import expect
+from tornado.concurrent import Future
 from tornado.testing import gen_test
 from bson.objectid import ObjectId
 
@@ -930,6 +931,42 @@ class TestDocument(AsyncTestCase):
 
         expect(count).to_equal(4)
 
+    def test_can_update_documents_with_operators(self):
+        User.objects.create(email="email@gmail.com", first_name="First", callback=self.stop)
+        self.wait()
+        User.objects.create(email="email2@gmail.com", first_name="First", callback=self.stop)
+        self.wait()
+
+        User.objects.filter(email="email2@gmail.com").update(set__last_name="Updated", callback=self.stop)
+        result = self.wait()
+
+        expect(result.count).to_equal(1)
+        expect(result.updated_existing).to_be_true()
+
+        User.objects.get(email="email2@gmail.com", callback=self.stop)
+        user = self.wait()
+
+        expect(user.last_name).to_equal("Updated")
+
+    @gen_test
+    def test_can_modify_and_pop_one_document(self):
+        yield User.objects.create(email="email@gmail.com", first_name="First")
+
+        modified = Future()
+        yield User.objects.filter(email="email@gmail.com").modify(
+            set__last_name="Modified", callback=modified.set_result
+        )
+        user = yield modified
+        expect(user.last_name).to_equal("Modified")
+
+        popped = Future()
+        yield User.objects.filter(email="email@gmail.com").pop_one(callback=popped.set_result)
+        user = yield popped
+        expect(user.last_name).to_equal("Modified")
+
+        count = yield User.objects.count()
+        expect(count).to_equal(0)
+
     def test_skip(self):
         User.objects.create(email="email@gmail.com", first_name="First", last_name="Last", callback=self.stop)
         self.wait()